@@ -18,23 +18,47 @@ class Texture:
             image.seek(28)
             self.bpp = struct.unpack("=h", image.read(2))[0]
 
+            if self.bpp not in (24, 32):
+                raise ValueError(f"BMP de {self.bpp} bits no soportado: {self.path}")
+
+            # Altura negativa: las filas vienen de arriba hacia abajo
+            top_down = self.height < 0
+            self.height = abs(self.height)
+
+            # Cada fila se rellena hasta múltiplo de 4 bytes
+            byte_depth = self.bpp // 8
+            row_size = (self.width * byte_depth + 3) // 4 * 4
+
             image.seek(self.data_offset)
+            data = image.read(row_size * self.height)
+
+        rows = np.frombuffer(data, dtype=np.uint8, count=row_size * self.height).reshape(self.height, row_size)
+        pixels = rows[:, :self.width * byte_depth].reshape(self.height, self.width, byte_depth)
+
+        if top_down:
+            pixels = pixels[::-1]
 
-            self.framebuffer = []
-            for y in range(self.height):
-                self.framebuffer.append([])
-                for x in range(self.width):
-                    b = ord(image.read(1)) / 255
-                    g = ord(image.read(1)) / 255
-                    r = ord(image.read(1)) / 255
-                    self.framebuffer[y].append([r, g, b])
+        # Fila 0 = fila inferior de la imagen, canales BGR(A) -> RGB
+        self.pixels = np.ascontiguousarray(pixels[:, :, 2::-1])
 
     def get_color(self, tx, ty):
         if 0 <= tx < 1 and 0 <= ty < 1:
             x = int(tx * self.width)
             y = int(ty * self.height)
-            
+
             if 0 <= x < self.width and 0 <= y < self.height:
-                return self.framebuffer[y][x]
-        
-        return [1, 1, 1]
\ No newline at end of file
+                return [c / 255 for c in self.pixels[y, x].tolist()]
+
+        return [1, 1, 1]
+
+    def get_color_batch(self, tx, ty):
+        tx = np.asarray(tx, dtype=float)
+        ty = np.asarray(ty, dtype=float)
+
+        inside = (tx >= 0) & (tx < 1) & (ty >= 0) & (ty < 1)
+        x = np.clip((np.where(inside, tx, 0) * self.width).astype(np.int64), 0, self.width - 1)
+        y = np.clip((np.where(inside, ty, 0) * self.height).astype(np.int64), 0, self.height - 1)
+
+        colors = np.ones(tx.shape + (3,))
+        colors[inside] = self.pixels[y[inside], x[inside]] / 255
+        return colors
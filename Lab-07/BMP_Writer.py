@@ -1,7 +1,12 @@
 import struct
+import numpy as np
+
+def GenerateBMP(filename: str, width: int, height: int, byteDepth: int, colorBuffer, topDown: bool = False) -> None:
+    # colorBuffer puede ser un arreglo (height, width, 3) uint8 indexado por filas,
+    # o la lista de columnas colorBuffer[x][y] que se usaba antes.
+    # Por defecto la fila 0 es la primera que se escribe (la inferior del BMP);
+    # con topDown=True la fila 0 es la superior de la imagen.
 
-def GenerateBMP(filename: str, width: int, height: int, byteDepth: int, colorBuffer: list[list[tuple[int, int, int]]]) -> None:
-    
     def char(c: str) -> bytes:
         # 1 byte
         return struct.pack("<c", c.encode("ascii"))
@@ -14,30 +19,50 @@ def GenerateBMP(filename: str, width: int, height: int, byteDepth: int, colorBuf
         # 4 bytes
         return struct.pack("<L", d)
 
-    with open(filename, "wb") as file:
+    if isinstance(colorBuffer, np.ndarray):
+        pixels = colorBuffer
+    else:
+        pixels = np.asarray(colorBuffer, dtype=np.uint8).transpose(1, 0, 2)
+
+    if pixels.shape[:2] != (height, width):
+        raise ValueError(f"El buffer mide {pixels.shape[:2]}, se esperaba {(height, width)}")
+
+    if topDown:
+        pixels = pixels[::-1]
+
+    # Cada fila se rellena hasta múltiplo de 4 bytes
+    rowSize = (width * byteDepth + 3) // 4 * 4
+    imageSize = rowSize * height
+
+    payload = np.zeros((height, rowSize), dtype=np.uint8)
+    rows = payload[:, :width * byteDepth].reshape(height, width, byteDepth)
+    channels = min(byteDepth, pixels.shape[2])
+    rows[:, :, :channels] = pixels[:, :, channels - 1::-1] if channels > 1 else pixels[:, :, :1]
+    if byteDepth > channels:
+        rows[:, :, channels:] = 255
+
+    header = b"".join([
         # Header
-        file.write(char("B"))
-        file.write(char("M"))
-        file.write(dword(14 + 40 + (width * height * byteDepth)))
-        file.write(dword(0))
-        file.write(dword(14 + 40))
-        
+        char("B"),
+        char("M"),
+        dword(14 + 40 + imageSize),
+        dword(0),
+        dword(14 + 40),
+
         # Info Header
-        file.write(dword(40))
-        file.write(dword(width))
-        file.write(dword(height))
-        file.write(word(1))
-        file.write(word(byteDepth * 8))
-        file.write(dword(0))
-        file.write(dword(width * height * byteDepth))
-        file.write(dword(0))
-        file.write(dword(0))
-        file.write(dword(0))
-        file.write(dword(0))
-        
-        # Color table
-        for y in range(height):
-            for x in range(width):
-                color = colorBuffer[x][y]
-                for i in range(len(color) - 1, -1, -1):
-                    file.write(color[i].to_bytes(1, "little"))
+        dword(40),
+        dword(width),
+        dword(height),
+        word(1),
+        word(byteDepth * 8),
+        dword(0),
+        dword(imageSize),
+        dword(0),
+        dword(0),
+        dword(0),
+        dword(0)
+    ])
+
+    with open(filename, "wb") as file:
+        file.write(header)
+        file.write(payload)
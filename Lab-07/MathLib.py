@@ -5,19 +5,19 @@ from math import pi, sin, cos, isclose
 
 def TranslationMatrix(x, y, z):
 	
-	return np.matrix([[1, 0, 0, x],
-					  [0, 1, 0, y],
-					  [0, 0, 1, z],
-					  [0, 0, 0, 1]])
+	return np.array([[1, 0, 0, x],
+					 [0, 1, 0, y],
+					 [0, 0, 1, z],
+					 [0, 0, 0, 1]], dtype=float)
 
 
 
 def ScaleMatrix(x, y, z):
 	
-	return np.matrix([[x, 0, 0, 0],
-					  [0, y, 0, 0],
-					  [0, 0, z, 0],
-					  [0, 0, 0, 1]])
+	return np.array([[x, 0, 0, 0],
+					 [0, y, 0, 0],
+					 [0, 0, z, 0],
+					 [0, 0, 0, 1]], dtype=float)
 
 
 
@@ -28,22 +28,106 @@ def RotationMatrix(pitch, yaw, roll):
 	yaw *= pi/180
 	roll *= pi/180
 	
-	pitchMat = np.matrix([[1,0,0,0],
-						  [0,cos(pitch),-sin(pitch),0],
-						  [0,sin(pitch),cos(pitch),0],
-						  [0,0,0,1]])
+	pitchMat = np.array([[1,0,0,0],
+						 [0,cos(pitch),-sin(pitch),0],
+						 [0,sin(pitch),cos(pitch),0],
+						 [0,0,0,1]])
 	
-	yawMat = np.matrix([[cos(yaw),0,sin(yaw),0],
-						[0,1,0,0],
-						[-sin(yaw),0,cos(yaw),0],
-						[0,0,0,1]])
+	yawMat = np.array([[cos(yaw),0,sin(yaw),0],
+					   [0,1,0,0],
+					   [-sin(yaw),0,cos(yaw),0],
+					   [0,0,0,1]])
 	
-	rollMat = np.matrix([[cos(roll),-sin(roll),0,0],
-						 [sin(roll),cos(roll),0,0],
-						 [0,0,1,0],
-						 [0,0,0,1]])
+	rollMat = np.array([[cos(roll),-sin(roll),0,0],
+						[sin(roll),cos(roll),0,0],
+						[0,0,1,0],
+						[0,0,0,1]])
 	
-	return pitchMat * yawMat * rollMat
+	return pitchMat @ yawMat @ rollMat
+
+class Transform:
+    """Transformación afín 4x4 (traslación * rotación * escala) sobre ndarray.
+    La matriz, su inversa y la matriz de normales se recalculan solo cuando cambia algún parámetro;
+    asignar el mismo valor no invalida la caché."""
+
+    def __init__(self, translation = (0, 0, 0), rotation = (0, 0, 0), scale = (1, 1, 1)):
+        self._translation = tuple(float(v) for v in translation)
+        self._rotation = tuple(float(v) for v in rotation)
+        self._scale = tuple(float(v) for v in scale)
+        self.dirty = True
+
+    @property
+    def translation(self):
+        return self._translation
+
+    @translation.setter
+    def translation(self, value):
+        value = tuple(float(v) for v in value)
+        self.dirty |= value != self._translation
+        self._translation = value
+
+    @property
+    def rotation(self):
+        return self._rotation
+
+    @rotation.setter
+    def rotation(self, value):
+        value = tuple(float(v) for v in value)
+        self.dirty |= value != self._rotation
+        self._rotation = value
+
+    @property
+    def scale(self):
+        return self._scale
+
+    @scale.setter
+    def scale(self, value):
+        value = tuple(float(v) for v in value)
+        self.dirty |= value != self._scale
+        self._scale = value
+
+    def update(self):
+        if not self.dirty:
+            return
+
+        self._matrix = TranslationMatrix(*self._translation) @ RotationMatrix(*self._rotation) @ ScaleMatrix(*self._scale)
+        self._inverse = np.linalg.inv(self._matrix)
+        # Las normales se transforman con la inversa transpuesta
+        self._normal_matrix = self._inverse[:3, :3].T
+        self.dirty = False
+
+    @property
+    def matrix(self):
+        self.update()
+        return self._matrix
+
+    @property
+    def inverse(self):
+        self.update()
+        return self._inverse
+
+    @property
+    def normal_matrix(self):
+        self.update()
+        return self._normal_matrix
+
+    def transform_points(self, points):
+        matrix = self.matrix
+        return np.asarray(points, dtype=float) @ matrix[:3, :3].T + matrix[:3, 3]
+
+    def transform_directions(self, directions):
+        return np.asarray(directions, dtype=float) @ self.matrix[:3, :3].T
+
+    def transform_normals(self, normals):
+        normals = np.asarray(normals, dtype=float) @ self.normal_matrix.T
+        return normals / np.linalg.norm(normals, axis=-1, keepdims=True)
+
+    def inverse_transform_points(self, points):
+        inverse = self.inverse
+        return np.asarray(points, dtype=float) @ inverse[:3, :3].T + inverse[:3, 3]
+
+    def inverse_transform_directions(self, directions):
+        return np.asarray(directions, dtype=float) @ self.inverse[:3, :3].T
 
 def LookAtMatrix(eye, target, up):
     """Matriz de vista - posición de cámara"""
@@ -59,7 +143,7 @@ def LookAtMatrix(eye, target, up):
     
     up = np.cross(right, forward)
     
-    return np.matrix([
+    return np.array([
         [right[0], right[1], right[2], -np.dot(right, eye)],
         [up[0], up[1], up[2], -np.dot(up, eye)],
         [-forward[0], -forward[1], -forward[2], np.dot(forward, eye)],
@@ -71,7 +155,7 @@ def PerspectiveMatrix(fov, aspect, near, far):
     import math
     f = 1.0 / math.tan(math.radians(fov) / 2.0)
     
-    return np.matrix([
+    return np.array([
         [f / aspect, 0, 0, 0],
         [0, f, 0, 0],
         [0, 0, (far + near) / (near - far), (2 * far * near) / (near - far)],
@@ -80,7 +164,7 @@ def PerspectiveMatrix(fov, aspect, near, far):
 
 def ViewportMatrix(x, y, width, height):
     """Matriz de viewport - transformación a coordenadas de pantalla"""
-    return np.matrix([
+    return np.array([
         [width/2, 0, 0, x + width/2],
         [0, -height/2, 0, y + height/2],
         [0, 0, 1, 0],
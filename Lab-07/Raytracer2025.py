@@ -1,20 +1,31 @@
 import pygame
+import multiprocessing
 import numpy as np
 from math import pi, tan, atan2, asin, sqrt, acos
 from camera import Camera
 from figures import Sphere, Material, Plane, Disk, Triangle, Cube
+from figures import OPAQUE, REFLECTIVE, TRANSPARENT
 from BMP_Writer import GenerateBMP
+from bvh import SceneBVH
+from scene import Scene
+from framebuffer import SharedFramebuffer
 from figures import *
 from lights import *
 from refectoredFunctions import reflect, refract, fresnel, normalize, EPS
+from refectoredFunctions import reflect_batch, refract_batch, fresnel_batch, normalize_batch
+from refectoredFunctions import mix_keys, uniform_from_keys
 
 class EnvMap:
-    def __init__(self, path):
+    def __init__(self, path, exposure=0.005, gamma=2.2):
         self.path = path
         self.pixels = None
+        self.texels = None
         self.width = 0
         self.height = 0
+        self.exposure = exposure
+        self.gamma = gamma
         self.load_hdr()
+        self.prepare()
     
     def load_hdr(self):
         try:
@@ -35,14 +46,27 @@ class EnvMap:
     def create_default_env(self):
         self.width = 512
         self.height = 256
-        self.pixels = np.zeros((self.height, self.width, 3), dtype=np.float32)
-        for y in range(self.height):
-            for x in range(self.width):
-                t = y / self.height
-                self.pixels[y, x] = [0.5 + 0.5*t, 0.7 + 0.3*t, 1.0]
-    
-    def get_color(self, u, v):
+        t = (np.arange(self.height, dtype=np.float32) / self.height)[:, None]
+        self.pixels = np.empty((self.height, self.width, 3), dtype=np.float32)
+        self.pixels[:, :, 0] = 0.5 + 0.5*t
+        self.pixels[:, :, 1] = 0.7 + 0.3*t
+        self.pixels[:, :, 2] = 1.0
+
+    def prepare(self):
+        # Exposición, Reinhard y gamma se aplican una sola vez por texel
         if self.pixels is None:
+            return
+
+        color = self.pixels[:, :, :3] * np.float32(self.exposure)
+        color = color / (1 + color)
+        color = np.power(np.maximum(color, 0), np.float32(1.0 / self.gamma))
+        self.texels = np.ascontiguousarray(np.clip(color, 0, 1), dtype=np.float32)
+
+        # El HDR crudo ya no se usa; no se guarda ni se envía a los procesos
+        self.pixels = None
+
+    def get_color(self, u, v):
+        if self.texels is None:
             return [0.5, 0.7, 1.0]
             
         u = u % 1.0
@@ -57,25 +81,56 @@ class EnvMap:
         fx = x - x0
         fy = y - y0
         
-        c00 = self.pixels[y0, x0]
-        c01 = self.pixels[y0, x1]
-        c10 = self.pixels[y1, x0]
-        c11 = self.pixels[y1, x1]
+        c00 = self.texels[y0, x0]
+        c01 = self.texels[y0, x1]
+        c10 = self.texels[y1, x0]
+        c11 = self.texels[y1, x1]
         
         color = (c00 * (1 - fx) * (1 - fy) +
                 c01 * fx * (1 - fy) +
                 c10 * (1 - fx) * fy +
                 c11 * fx * fy)
         
-        exposure = 0.005
-        color = color * exposure
-        color = color / (1 + color)
-        
-        gamma = 1.0 / 2.2
-        color = np.power(np.maximum(color, 0), gamma)
-        
         return [min(1, max(0, float(c))) for c in color]
 
+    def get_color_batch(self, u, v):
+        if self.texels is None:
+            return np.tile([0.5, 0.7, 1.0], (len(u), 1))
+
+        u = u % 1.0
+        v = np.clip(v, 0, 1)
+
+        x = u * (self.width - 1)
+        y = v * (self.height - 1)
+
+        x0 = x.astype(np.int64)
+        y0 = y.astype(np.int64)
+        x1 = np.minimum(x0 + 1, self.width - 1)
+        y1 = np.minimum(y0 + 1, self.height - 1)
+
+        fx = (x - x0)[:, None]
+        fy = (y - y0)[:, None]
+
+        c00 = self.texels[y0, x0]
+        c01 = self.texels[y0, x1]
+        c10 = self.texels[y1, x0]
+        c11 = self.texels[y1, x1]
+
+        color = (c00 * (1 - fx) * (1 - fy) +
+                c01 * fx * (1 - fy) +
+                c10 * (1 - fx) * fy +
+                c11 * fx * fy)
+
+        return np.clip(color, 0, 1)
+
+    def lookup(self, directions):
+        directions = directions / np.linalg.norm(directions, axis=1)[:, None]
+
+        u = (np.arctan2(directions[:, 0], -directions[:, 2]) + pi) / (2 * pi)
+        v = (np.arcsin(np.clip(directions[:, 1], -1, 1)) + pi/2) / pi
+
+        return self.get_color_batch(u, v)
+
 class Raytracer:
     def __init__(self, width=800, height=600):
         self.width = width
@@ -87,7 +142,26 @@ class Raytracer:
         self.current_color = [1, 1, 1]
         self.ambient_light = [0.1, 0.1, 0.1]
         self.max_recursions = 5
+        self.fov = 60
+        # Direcciones primarias normalizadas de todos los píxeles, por (ancho, alto, fov, rotación)
+        self.ray_grid = None
+        self.ray_grid_key = None
+        # Las ramas cuyo aporte al píxel queda por debajo de este peso se descartan;
+        # con russian_roulette sobreviven al azar y se compensa su peso.
+        # En 0 no se descarta nada y el render por paquetes es idéntico al escalar;
+        # con un valor como 1 / 255 es más rápido pero algunos píxeles cambian en 1 nivel
+        self.min_throughput = 0
+        self.russian_roulette = False
+        # Antialiasing adaptativo: con aa_samples > 1 solo los píxeles de borde
+        # se vuelven a muestrear, con aa_samples muestras cada uno
+        self.aa_samples = 1
+        self.aa_color_threshold = 0.1
+        self.aa_depth_threshold = 0.1
         self.envMap = None
+        self.bvh = None
+        self.compiled = None
+        self.bvh_threshold = 32
+        self.framebuffer = None
         
     def get_env_color(self, direction):
         if self.envMap:
@@ -98,7 +172,21 @@ class Raytracer:
             
             return self.envMap.get_color(u, v)
         return self.clear_color
-        
+
+    def get_env_color_batch(self, directions):
+        if self.envMap:
+            return self.envMap.lookup(directions)
+        return np.tile(np.array(self.clear_color, dtype=float), (len(directions), 1))
+        
+    def compile(self, force_bvh=False):
+        # Congela las figuras en arreglos por tipo; el render por paquetes solo usa esta forma.
+        # En escenas pequeñas probar todos los grupos es más rápido que recorrer el BVH,
+        # salvo que se pida con force_bvh
+        self.compiled = Scene(self.scene)
+        use_bvh = force_bvh or len(self.scene) > self.bvh_threshold
+        self.bvh = SceneBVH(self.compiled) if use_bvh else None
+        return self.compiled
+
     def glClearColor(self, r, g, b):
         self.clear_color = [r, g, b]
         
@@ -109,21 +197,14 @@ class Raytracer:
         if recursion >= self.max_recursions:
             return self.get_env_color(direction)
             
-        min_distance = float('inf')
-        hit = None
-        
-        for obj in self.scene:
-            intersect = obj.ray_intersect(origin, direction)
-            if intersect and intersect['distance'] < min_distance:
-                min_distance = intersect['distance']
-                hit = intersect
+        hit = self.cast_ray_simple(origin, direction)
                 
         if not hit:
             return self.get_env_color(direction)
             
-        material = hit['material']
-        point = hit['point']
-        normal = normalize(hit['normal'])
+        material = hit.material
+        point = hit.point
+        normal = normalize(hit.normal)
         direction = normalize(direction)
         
         is_outside = np.dot(direction, normal) < 0
@@ -172,30 +253,33 @@ class Raytracer:
             return self.phong_lighting(hit, direction)
     
     def cast_ray_simple(self, origin, direction):
+        if self.bvh:
+            return self.bvh.closest_hit(origin, direction)
+
         min_distance = float('inf')
         hit = None
         
         for obj in self.scene:
-            intersect = obj.ray_intersect(origin, direction)
-            if intersect and intersect['distance'] < min_distance:
-                min_distance = intersect['distance']
+            intersect = obj.ray_intersect(origin, direction, min_distance)
+            if intersect:
+                min_distance = intersect.distance
                 hit = intersect
                 
         return hit
     
     def cast_shadow_ray(self, origin, direction, max_distance):
+        if self.bvh:
+            return self.bvh.any_hit(origin, direction, max_distance)
+
         for obj in self.scene:
-            intersect = obj.ray_intersect(origin, direction)
-            if intersect:
-                d = intersect['distance']
-                if d > EPS and d < max_distance:
-                    return True
+            if obj.occludes(origin, direction, EPS, max_distance):
+                return True
         return False
     
     def phong_lighting(self, hit, ray_direction):
-        material = hit['material']
-        point = hit['point']
-        normal = hit['normal']
+        material = hit.material
+        point = hit.point
+        normal = hit.normal
         
         final_color = [0, 0, 0]
         
@@ -237,25 +321,364 @@ class Raytracer:
                                              light.intensity)
         
         return [min(1, max(0, c)) for c in final_color]
+
+    def closest_hit_batch(self, origins, directions):
+        # cast_ray_batch compila la escena antes de llegar aquí
+        if self.bvh:
+            return self.bvh.closest_hit_batch(origins, directions)
+        return self.compiled.closest_hit_batch(origins, directions)
+
+    def cast_shadow_ray_batch(self, origins, direction, max_distance):
+        directions = np.broadcast_to(direction, origins.shape)
+        if self.bvh:
+            return self.bvh.any_hit_batch(origins, directions, max_distance)
+        return self.compiled.any_hit_batch(origins, directions, EPS, max_distance)
+
+    def phong_lighting_batch(self, points, normals, ray_directions, mat_ids):
+        # Un solo pase para choques de cualquier material; las propiedades salen de la tabla
+        materials = self.compiled.materials
+        diffuse = materials.diffuse[mat_ids]
+        ks = materials.ks[mat_ids]
+        spec = materials.spec[mat_ids]
+
+        ambient_factor = np.where(materials.kind[mat_ids] == REFLECTIVE, 2.0, 1.0)
+        final_color = np.array(self.ambient_light) * diffuse * ambient_factor[:, None]
+
+        view_dirs = -ray_directions
+        view_dirs = view_dirs / np.linalg.norm(view_dirs, axis=1)[:, None]
+
+        for light in self.lights:
+            if light.lightType == "Directional":
+                light_dir = -np.array(light.direction, dtype=float)
+                light_dir = light_dir / np.linalg.norm(light_dir)
+
+                shadow_origins = points + normals * EPS
+                lit = ~self.cast_shadow_ray_batch(shadow_origins, light_dir, float('inf'))
+
+                n_dot_l = normals[lit] @ light_dir
+                diffuse_intensity = np.maximum(0, n_dot_l)[:, None]
+                final_color[lit] += diffuse_intensity * diffuse[lit] * np.array(light.color) * light.intensity
+
+                shiny = np.nonzero(lit)[0][ks[lit] > 0]
+                if len(shiny):
+                    n_dot_l = normals[shiny] @ light_dir
+                    reflect_dirs = 2 * n_dot_l[:, None] * normals[shiny] - light_dir
+                    reflect_dirs = reflect_dirs / np.linalg.norm(reflect_dirs, axis=1)[:, None]
+
+                    spec_intensity = np.maximum(0, np.einsum('ij,ij->i', view_dirs[shiny], reflect_dirs)) ** spec[shiny]
+
+                    specular_color = np.array([1.0, 1.0, 1.0])
+                    final_color[shiny] += (ks[shiny] * spec_intensity * light.intensity)[:, None] * specular_color
+
+        return np.clip(final_color, 0, 1)
+
+    def cast_ray_batch(self, origins, directions, primary_hits=False, keys=None):
+        # Frente de onda: todos los rayos de un mismo rebote se intersecan y sombrean juntos.
+        # Cada rayo lleva el píxel al que aporta y su peso acumulado (throughput);
+        # varios rayos pueden aportar al mismo píxel, por eso se acumula con np.add.at.
+        # keys identifica cada rayo primario (p. ej. el índice global del píxel) y fija
+        # la ruleta rusa; sin keys se usa la posición del rayo en el arreglo.
+        # Con primary_hits=True también devuelve distancia y objeto del primer choque.
+        origins = np.broadcast_to(origins, directions.shape)
+
+        if self.compiled is None:
+            self.compile()
+
+        colors = np.zeros(directions.shape)
+        pixels = np.arange(len(directions))
+        weights = np.ones(directions.shape)
+        keys = np.arange(len(directions), dtype=np.uint64) if keys is None else np.asarray(keys, dtype=np.uint64).ravel()
+
+        first_distances = np.full(len(directions), np.inf)
+        first_obj_ids = np.full(len(directions), -1)
+
+        for depth in range(self.max_recursions + 1):
+            if len(pixels) == 0:
+                break
+
+            if depth == self.max_recursions:
+                np.add.at(colors, pixels, weights * self.get_env_color_batch(directions))
+                break
+
+            distances, normals, obj_ids = self.closest_hit_batch(origins, directions)
+            if depth == 0:
+                first_distances = distances
+                first_obj_ids = obj_ids
+
+            miss = obj_ids < 0
+            if miss.any():
+                np.add.at(colors, pixels[miss], weights[miss] * self.get_env_color_batch(directions[miss]))
+
+            next_origins = []
+            next_directions = []
+            next_pixels = []
+            next_weights = []
+            next_keys = []
+
+            def spawn(idx, ray_origins, ray_directions, ray_weights, branch):
+                next_origins.append(ray_origins)
+                next_directions.append(ray_directions)
+                next_pixels.append(pixels[idx])
+                next_weights.append(ray_weights)
+                # Cada rama hereda una clave propia derivada de la del rayo padre
+                next_keys.append(mix_keys(keys[idx], branch))
+
+            # Los choques se agrupan por tipo de material, no por objeto
+            hits = np.nonzero(obj_ids >= 0)[0]
+            mat_ids = self.compiled.material_ids[obj_ids[hits]]
+            kinds = self.compiled.materials.kind[mat_ids]
+
+            idx = hits[kinds == OPAQUE]
+            if len(idx):
+                points = origins[idx] + directions[idx] * distances[idx, None]
+                lighting = self.phong_lighting_batch(points, normals[idx], directions[idx], mat_ids[kinds == OPAQUE])
+                np.add.at(colors, pixels[idx], weights[idx] * lighting)
+
+            specular = kinds != OPAQUE
+            idx = hits[specular]
+            if len(idx):
+                mat_ids = mat_ids[specular]
+                kinds = kinds[specular]
+
+                points = origins[idx] + directions[idx] * distances[idx, None]
+                hit_normals = normals[idx]
+
+                normal = normalize_batch(hit_normals)
+                direction = normalize_batch(directions[idx])
+
+                is_outside = np.einsum('ij,ij->i', direction, normal) < 0
+                bias = np.where(is_outside[:, None], normal * EPS, -normal * EPS)
+
+                base_lighting = self.phong_lighting_batch(points, hit_normals, direction, mat_ids)
+                np.add.at(colors, pixels[idx], weights[idx] * base_lighting * 0.05)
+
+                reflect_dir = reflect_batch(direction, normal, normalized=True)
+                materials = self.compiled.materials
+
+                r = kinds == REFLECTIVE
+                if r.any():
+                    tint = materials.diffuse[mat_ids[r]]
+                    spawn(idx[r], points[r] + bias[r], reflect_dir[r], weights[idx[r]] * tint * 0.95, REFLECTIVE)
+
+                t = np.nonzero(kinds == TRANSPARENT)[0]
+                if len(t):
+                    n1 = 1.0
+                    n2 = materials.ior[mat_ids[t]]
+                    kr = fresnel_batch(direction[t], normal[t], n1, n2, normalized=True)
+
+                    refract_dir, tir = refract_batch(direction[t], normal[t], n1, n2, normalized=True)
+                    refracted = (kr < 1) & ~tir
+                    if refracted.any():
+                        rt = t[refracted]
+                        tint = materials.diffuse[mat_ids[rt]]
+                        tint = tint * 0.3 + 0.7
+                        spawn(idx[rt], points[rt] - bias[rt], refract_dir[refracted],
+                              weights[idx[rt]] * (1 - kr[refracted])[:, None] * tint * 0.95, TRANSPARENT)
+
+                    spawn(idx[t], points[t] + bias[t], reflect_dir[t], weights[idx[t]] * kr[:, None] * 0.95, REFLECTIVE)
+
+            if not next_pixels:
+                break
+
+            origins = np.concatenate(next_origins)
+            directions = np.concatenate(next_directions)
+            pixels = np.concatenate(next_pixels)
+            weights = np.concatenate(next_weights)
+            keys = np.concatenate(next_keys)
+
+            keep = self.prune_rays(weights, keys)
+            if keep is not None:
+                origins = origins[keep]
+                directions = directions[keep]
+                pixels = pixels[keep]
+                weights = weights[keep]
+                keys = keys[keep]
+
+        if primary_hits:
+            return np.clip(colors, 0, 1), first_distances, first_obj_ids
+
+        return np.clip(colors, 0, 1)
+
+    def prune_rays(self, weights, keys):
+        # Devuelve la máscara de rayos que siguen, o None si no se descarta ninguno
+        if self.min_throughput <= 0:
+            return None
+
+        strength = weights.max(axis=1)
+        weak = strength < self.min_throughput
+        if not weak.any():
+            return None
+
+        if not self.russian_roulette:
+            return ~weak
+
+        # Sobrevive con probabilidad strength / min_throughput y su peso se divide por ella,
+        # así el valor esperado del píxel no cambia. El sorteo sale de la clave del rayo
+        survival = strength[weak] / self.min_throughput
+        survived = uniform_from_keys(keys[weak]) < survival
+        weak_ids = np.nonzero(weak)[0]
+        weights[weak_ids[survived]] /= survival[survived, None]
+
+        keep = ~weak
+        keep[weak_ids[survived]] = True
+        return keep
+
+    def primary_rays(self, px, py):
+        # px, py: coordenadas de muestra en píxeles (el centro del píxel x es x + 0.5)
+        fov = self.fov
+        aspect_ratio = self.width / self.height
+        fov_radians = fov * pi / 180
+        scale = tan(fov_radians / 2)
+
+        u = (2 * px.ravel() / self.width - 1) * aspect_ratio * scale
+        v = (1 - 2 * py.ravel() / self.height) * scale
+
+        # La rotación de la cámara se aplica a los ejes de la imagen, no a cada rayo
+        rotation = self.camera.transform.matrix[:3, :3]
+        directions = np.outer(u, rotation[:, 0]) + np.outer(v, rotation[:, 1]) - rotation[:, 2]
+
+        return directions / np.linalg.norm(directions, axis=1)[:, None]
+
+    def primary_grid(self):
+        # Se reutiliza entre renders mientras no cambie el tamaño, el fov o la rotación de la cámara
+        key = (self.width, self.height, self.fov, tuple(self.camera.rotation))
+        if self.ray_grid_key != key:
+            py, px = np.meshgrid(np.arange(self.height) + 0.5, np.arange(self.width) + 0.5, indexing='ij')
+            self.ray_grid = self.primary_rays(px, py).reshape(self.height, self.width, 3)
+            self.ray_grid_key = key
+        return self.ray_grid
+
+    def find_edges(self, colors, distances, obj_ids):
+        # Marca ambos lados de cada par de vecinos que difiere en objeto, profundidad o color
+        edges = np.zeros(obj_ids.shape, dtype=bool)
+
+        for axis in (0, 1):
+            a = [slice(None), slice(None)]
+            b = [slice(None), slice(None)]
+            a[axis] = slice(None, -1)
+            b[axis] = slice(1, None)
+            a, b = tuple(a), tuple(b)
+
+            with np.errstate(invalid='ignore'):
+                near = np.minimum(distances[a], distances[b])
+                depth_edge = np.abs(distances[a] - distances[b]) > self.aa_depth_threshold * near
+
+            differs = (obj_ids[a] != obj_ids[b]) | depth_edge
+            differs |= np.abs(colors[a] - colors[b]).max(axis=-1) > self.aa_color_threshold
+
+            edges[a] |= differs
+            edges[b] |= differs
+
+        return edges
+
+    def pixel_keys(self, x0, y0, x1, y1):
+        # Índice global de cada píxel del rectángulo, fila por fila
+        py, px = np.mgrid[y0:y1, x0:x1]
+        return (py * self.width + px).ravel().astype(np.uint64)
+
+    def render_tile(self, x0, y0, x1, y1):
+        origin = np.array(self.camera.translation, dtype=float)
+
+        if self.aa_samples <= 1:
+            directions = self.primary_grid()[y0:y1, x0:x1].reshape(-1, 3)
+            colors = self.cast_ray_batch(origin, directions, keys=self.pixel_keys(x0, y0, x1, y1))
+            colors = colors.reshape(y1 - y0, x1 - x0, 3)
+        else:
+            colors = self.render_tile_adaptive(origin, x0, y0, x1, y1)
+
+        return np.clip(colors * 255, 0, 255).astype(np.uint8)
+
+    def render_tile_adaptive(self, origin, x0, y0, x1, y1):
+        # Un borde de un píxel alrededor del tile para detectar bordes que cruzan entre tiles
+        ax0, ay0 = max(x0 - 1, 0), max(y0 - 1, 0)
+        ax1, ay1 = min(x1 + 1, self.width), min(y1 + 1, self.height)
+
+        directions = self.primary_grid()[ay0:ay1, ax0:ax1].reshape(-1, 3)
+        colors, distances, obj_ids = self.cast_ray_batch(origin, directions, primary_hits=True,
+                                                         keys=self.pixel_keys(ax0, ay0, ax1, ay1))
+
+        shape = (ay1 - ay0, ax1 - ax0)
+        edges = self.find_edges(colors.reshape(shape + (3,)), distances.reshape(shape), obj_ids.reshape(shape))
+
+        inner = (slice(y0 - ay0, y1 - ay0), slice(x0 - ax0, x1 - ax0))
+        colors = colors.reshape(shape + (3,))[inner].copy()
+        ey, ex = np.nonzero(edges[inner])
+        if len(ey) == 0:
+            return colors
+
+        # Solo los píxeles de borde reciben n x n muestras estratificadas con jitter;
+        # el jitter sale del índice global del píxel y de la muestra, así la imagen
+        # no depende de cómo se parte en tiles
+        n = max(1, int(np.ceil(np.sqrt(self.aa_samples))))
+        sample = np.arange(n * n)
+        sy, sx = np.divmod(sample, n)
+
+        pixels = ((y0 + ey) * self.width + (x0 + ex)).astype(np.uint64)
+        keys = mix_keys(pixels[:, None], sample[None, :] + 3)
+
+        px = (x0 + ex)[:, None] + (sx + uniform_from_keys(mix_keys(keys, 0))) / n
+        py = (y0 + ey)[:, None] + (sy + uniform_from_keys(mix_keys(keys, 1))) / n
+        samples = self.cast_ray_batch(origin, self.primary_rays(px, py), keys=keys)
+
+        colors[ey, ex] = samples.reshape(len(ey), n * n, 3).mean(axis=1)
+        return colors
+
+    def render_packet(self):
+        return self.render_tile(0, 0, self.width, self.height)
+
+    def tiles(self, tile_size):
+        return [(x, y, min(x + tile_size, self.width), min(y + tile_size, self.height))
+                for y in range(0, self.height, tile_size)
+                for x in range(0, self.width, tile_size)]
+
+    def render_parallel(self, tile_size=64, processes=None):
+        tiles = self.tiles(tile_size)
+
+        # Las direcciones primarias se calculan antes de crear los procesos para que ellos las reciban
+        self.primary_grid()
+
+        # Los procesos escriben sus tiles directo en memoria compartida; el bloque solo vive
+        # durante este render y se devuelve una copia
+        with SharedFramebuffer(self.width, self.height) as framebuffer:
+            self.framebuffer = framebuffer
+            try:
+                # La escena, luces y EnvMap se envían una sola vez a cada proceso
+                with multiprocessing.Pool(processes, initializer=init_tile_worker, initargs=(self,)) as pool:
+                    for done, _ in enumerate(pool.imap_unordered(render_tile_task, tiles), 1):
+                        if done % 50 == 0:
+                            print(f"Progreso: {done}/{len(tiles)} tiles")
+            finally:
+                self.framebuffer = None
+
+            return framebuffer.array.copy()
     
-    def render_to_bmp(self, filename="raytraced.bmp"):
+    def render_to_bmp(self, filename="raytraced.bmp", packet=False, parallel=False):
+        self.compile()
+
+        if parallel:
+            print(f"Renderizando imagen {self.width}x{self.height} (tiles en paralelo)...")
+            framebuffer = self.render_parallel()
+            GenerateBMP(filename, self.width, self.height, 3, framebuffer)
+            print(f"Imagen guardada como: {filename}")
+            return framebuffer
+
+        if packet:
+            print(f"Renderizando imagen {self.width}x{self.height} (paquetes)...")
+            framebuffer = self.render_packet()
+            GenerateBMP(filename, self.width, self.height, 3, framebuffer)
+            print(f"Imagen guardada como: {filename}")
+            return framebuffer
+
         framebuffer = []
         
         print(f"Renderizando imagen {self.width}x{self.height}...")
         
-        fov = 60
-        aspect_ratio = self.width / self.height
-        fov_radians = fov * pi / 180
-        scale = tan(fov_radians / 2)
+        directions = self.primary_grid()
         
         for y in range(self.height):
             row = []
             for x in range(self.width):
-                px = (2 * (x + 0.5) / self.width - 1) * aspect_ratio * scale
-                py = (1 - 2 * (y + 0.5) / self.height) * scale
-                
-                direction = np.array([px, py, -1])
-                direction = direction / np.linalg.norm(direction)
+                direction = directions[y, x]
                 
                 color = self.cast_ray(self.camera.translation, direction)
                 
@@ -271,83 +694,76 @@ class Raytracer:
             if y % 50 == 0:
                 print(f"Progreso: {y}/{self.height} líneas")
         
-        transposed_buffer = []
-        for x in range(self.width):
-            column = []
-            for y in range(self.height):
-                column.append(framebuffer[y][x])
-            transposed_buffer.append(column)
-        
-        GenerateBMP(filename, self.width, self.height, 3, transposed_buffer)
+        GenerateBMP(filename, self.width, self.height, 3, np.array(framebuffer, dtype=np.uint8))
         print(f"Imagen guardada como: {filename}")
         return framebuffer
     
-    def render_pygame(self):
+    def render_pygame(self, tile_size=32, processes=None, fps=30):
+        self.compile()
+
+        if not hasattr(self, 'lights') or not self.lights:
+            self.lights = [DirectionalLight(direction=[-1, -1, -1])]
+
+        # Los rayos se trazan en procesos aparte; la ventana solo muestra el buffer.
+        # El bloque compartido se libera al cerrar la ventana, después de terminar los procesos
+        self.primary_grid()
+        with SharedFramebuffer(self.width, self.height) as framebuffer:
+            self.framebuffer = framebuffer
+            try:
+                self.show_progressive(framebuffer, tile_size, processes, fps)
+            finally:
+                self.framebuffer = None
+
+    def show_progressive(self, framebuffer, tile_size, processes, fps):
+        pool = multiprocessing.Pool(processes, initializer=init_tile_worker, initargs=(self,))
+        result = pool.map_async(render_tile_task, self.tiles(tile_size), chunksize=1)
+        pool.close()
+
         pygame.init()
         screen = pygame.display.set_mode((self.width, self.height))
         pygame.display.set_caption("Ray Tracer 2025")
         clock = pygame.time.Clock()
         running = True
-        
-        if not hasattr(self, 'lights') or not self.lights:
-            self.lights = [DirectionalLight(direction=[-1, -1, -1])]
+        rendering = True
         
         print("Woah, woah, renderizando... Presiona ESC para salir")
         
-        rendered_pixels = 0
-        total_pixels = self.width * self.height
-        
-        indices = [(x, y) for x in range(self.width) for y in range(self.height)]
-        
-        while running and rendered_pixels < total_pixels:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        running = False
-            
-            fov = 60
-            aspect_ratio = self.width / self.height
-            fov_radians = fov * pi / 180
-            scale = tan(fov_radians / 2)
-            
-            for _ in range(200):
-                if rendered_pixels >= total_pixels:
-                    break
-                    
-                x, y = indices[rendered_pixels]
-                
-                px = (2 * (x + 0.5) / self.width - 1) * aspect_ratio * scale
-                py = (1 - 2 * (y + 0.5) / self.height) * scale
-                
-                direction = np.array([px, py, -1])
-                direction = direction / np.linalg.norm(direction)
-                
-                color = self.cast_ray(self.camera.translation, direction)
-                
-                pixel_color = (
-                    int(min(255, max(0, color[0] * 255))),
-                    int(min(255, max(0, color[1] * 255))),
-                    int(min(255, max(0, color[2] * 255)))
-                )
-                
-                screen.set_at((x, self.height - y - 1), pixel_color)
-                rendered_pixels += 1
-            
-            pygame.display.flip()
-            clock.tick(60)
-        
-        while running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
+        try:
+            while running:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
                         running = False
-            clock.tick(60)
-        
-        pygame.quit()
+                    elif event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_ESCAPE:
+                            running = False
+
+                if rendering:
+                    done = result.ready()
+                    # La fila 0 del buffer se dibuja abajo, igual que antes
+                    pygame.surfarray.blit_array(screen, framebuffer.array[::-1].swapaxes(0, 1))
+                    pygame.display.flip()
+                    rendering = not done
+
+                    # Si un proceso falló, get() vuelve a lanzar su excepción
+                    if done:
+                        result.get()
+
+                clock.tick(fps)
+        finally:
+            pool.terminate()
+            pool.join()
+            pygame.quit()
+
+tile_raytracer = None
+
+def init_tile_worker(raytracer):
+    global tile_raytracer
+    tile_raytracer = raytracer
+
+def render_tile_task(tile):
+    x0, y0, x1, y1 = tile
+    tile_raytracer.framebuffer.array[y0:y1, x0:x1] = tile_raytracer.render_tile(x0, y0, x1, y1)
+    return tile
 
 if __name__ == "__main__":
     raytracer = Raytracer(800, 600)
@@ -387,4 +803,4 @@ if __name__ == "__main__":
     raytracer.render_pygame()
     
     print("\nBMP...")
-    raytracer.render_to_bmp("RoomScene.bmp")
\ No newline at end of file
+    raytracer.render_to_bmp("RoomScene.bmp", parallel=True)
\ No newline at end of file
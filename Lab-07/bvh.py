@@ -0,0 +1,279 @@
+import numpy as np
+from refectoredFunctions import EPS
+from scene import Scene
+
+def surface_area(mins, maxs):
+    extent = np.maximum(maxs - mins, 0)
+    return 2 * (extent[..., 0] * extent[..., 1] +
+                extent[..., 1] * extent[..., 2] +
+                extent[..., 2] * extent[..., 0])
+
+class BVH:
+    """BVH con heurística de área superficial (SAH) sobre cajas alineadas a los ejes"""
+
+    def __init__(self, mins, maxs, max_leaf_size=4, traversal_cost=1.0):
+        self.max_leaf_size = max_leaf_size
+        self.traversal_cost = traversal_cost
+
+        self.node_min = []
+        self.node_max = []
+        self.node_left = []
+        self.node_right = []
+        self.node_axis = []
+        self.node_items = []
+
+        if len(mins) > 0:
+            self.build(np.asarray(mins, dtype=float) - EPS, np.asarray(maxs, dtype=float) + EPS)
+
+        self.node_min = np.array(self.node_min).reshape(-1, 3)
+        self.node_max = np.array(self.node_max).reshape(-1, 3)
+
+    def bounds(self):
+        if not self.node_items:
+            return None
+        return self.node_min[0], self.node_max[0]
+
+    def add_node(self):
+        self.node_min.append(None)
+        self.node_max.append(None)
+        self.node_left.append(-1)
+        self.node_right.append(-1)
+        self.node_axis.append(0)
+        self.node_items.append(None)
+        return len(self.node_items) - 1
+
+    def build(self, mins, maxs):
+        centroids = (mins + maxs) / 2
+        stack = [(self.add_node(), np.arange(len(mins)))]
+
+        while stack:
+            node, items = stack.pop()
+
+            node_min = mins[items].min(axis=0)
+            node_max = maxs[items].max(axis=0)
+            self.node_min[node] = node_min
+            self.node_max[node] = node_max
+
+            if len(items) <= self.max_leaf_size:
+                self.node_items[node] = items
+                continue
+
+            # Si dividir no es más barato que probar todo, se queda como hoja
+            split = self.find_split(items, mins, maxs, centroids)
+            leaf_cost = len(items) * surface_area(node_min, node_max)
+            if split[0] >= leaf_cost and len(items) <= 4 * self.max_leaf_size:
+                self.node_items[node] = items
+                continue
+
+            _, axis, ordered, mid = split
+            left = self.add_node()
+            right = self.add_node()
+            self.node_left[node] = left
+            self.node_right[node] = right
+            self.node_axis[node] = axis
+
+            stack.append((left, ordered[:mid]))
+            stack.append((right, ordered[mid:]))
+
+    def find_split(self, items, mins, maxs, centroids):
+        count = len(items)
+        parent_area = surface_area(mins[items].min(axis=0), maxs[items].max(axis=0))
+        left_counts = np.arange(1, count)
+        right_counts = count - left_counts
+        best = None
+
+        for axis in range(3):
+            ordered = items[np.argsort(centroids[items, axis], kind='stable')]
+            ordered_min = mins[ordered]
+            ordered_max = maxs[ordered]
+
+            left_area = surface_area(np.minimum.accumulate(ordered_min, axis=0),
+                                     np.maximum.accumulate(ordered_max, axis=0))[:-1]
+            right_area = surface_area(np.minimum.accumulate(ordered_min[::-1], axis=0)[::-1],
+                                      np.maximum.accumulate(ordered_max[::-1], axis=0)[::-1])[1:]
+
+            cost = self.traversal_cost * parent_area + left_area * left_counts + right_area * right_counts
+            i = int(np.argmin(cost))
+
+            if best is None or cost[i] < best[0]:
+                best = (cost[i], axis, ordered, i + 1)
+
+        return best
+
+    def is_leaf(self, node):
+        return self.node_items[node] is not None
+
+    def slab(self, node, origin, direction, t_max):
+        tnear = -float('inf')
+        tfar = t_max
+        node_min = self.node_min[node]
+        node_max = self.node_max[node]
+
+        for i in range(3):
+            if direction[i] == 0:
+                if origin[i] < node_min[i] or origin[i] > node_max[i]:
+                    return False
+                continue
+
+            t1 = (node_min[i] - origin[i]) / direction[i]
+            t2 = (node_max[i] - origin[i]) / direction[i]
+            if t1 > t2:
+                t1, t2 = t2, t1
+
+            tnear = max(tnear, t1)
+            tfar = min(tfar, t2)
+            if tnear > tfar:
+                return False
+
+        return tfar >= 0
+
+    def traverse(self, origin, direction, t_max):
+        origin = [float(c) for c in origin]
+        direction = [float(c) for c in direction]
+
+        if not self.node_items:
+            return
+
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if not self.slab(node, origin, direction, t_max()):
+                continue
+
+            if self.is_leaf(node):
+                yield self.node_items[node]
+            elif direction[self.node_axis[node]] >= 0:
+                stack.append(self.node_right[node])
+                stack.append(self.node_left[node])
+            else:
+                stack.append(self.node_left[node])
+                stack.append(self.node_right[node])
+
+    def slab_batch(self, node, origins, inv_directions, t_max):
+        with np.errstate(invalid='ignore'):
+            t1 = (self.node_min[node] - origins) * inv_directions
+            t2 = (self.node_max[node] - origins) * inv_directions
+
+        tnear = np.fmax.reduce(np.fmin(t1, t2), axis=1)
+        tfar = np.fmin.reduce(np.fmax(t1, t2), axis=1)
+
+        return (tnear <= tfar) & (tfar >= 0) & (tnear <= t_max)
+
+    def traverse_batch(self, origins, directions, t_max):
+        if not self.node_items or len(directions) == 0:
+            return
+
+        with np.errstate(divide='ignore'):
+            inv_directions = 1.0 / directions
+
+        stack = [(0, np.arange(len(directions)))]
+        while stack:
+            node, rays = stack.pop()
+            rays = rays[self.slab_batch(node, origins[rays], inv_directions[rays], t_max[rays])]
+            if len(rays) == 0:
+                continue
+
+            if self.is_leaf(node):
+                yield self.node_items[node], rays
+            elif directions[rays, self.node_axis[node]].sum() >= 0:
+                stack.append((self.node_right[node], rays))
+                stack.append((self.node_left[node], rays))
+            else:
+                stack.append((self.node_left[node], rays))
+                stack.append((self.node_right[node], rays))
+
+class SceneBVH(BVH):
+    """Estructura de nivel superior: cada figura (o modelo) es una hoja con sus límites.
+    Las hojas se prueban sobre la escena compilada (Scene), agrupadas por tipo."""
+
+    def __init__(self, objects, max_leaf_size=4, traversal_cost=1.0):
+        self.scene = objects if isinstance(objects, Scene) else Scene(objects)
+        self.objects = self.scene.objects
+
+        # Las figuras sin límites (planos) siempre se prueban
+        self.unbounded = []
+        self.bounded = []
+        mins = []
+        maxs = []
+
+        for i, obj in enumerate(self.objects):
+            bounds = obj.bounds() if hasattr(obj, 'bounds') else None
+            if bounds is None:
+                self.unbounded.append(i)
+            else:
+                self.bounded.append(i)
+                mins.append(bounds[0])
+                maxs.append(bounds[1])
+
+        self.bounded_ids = np.array(self.bounded, dtype=np.int64)
+
+        super().__init__(mins, maxs, max_leaf_size, traversal_cost)
+
+    def traverse_objects(self, origin, direction, t_max):
+        yield from self.unbounded
+        for items in self.traverse(origin, direction, t_max):
+            for item in items:
+                yield self.bounded[item]
+
+    def closest_hit(self, origin, direction):
+        hit = None
+        min_distance = float('inf')
+
+        for i in self.traverse_objects(origin, direction, lambda: min_distance):
+            intersect = self.objects[i].ray_intersect(origin, direction, min_distance)
+            if intersect:
+                min_distance = intersect.distance
+                hit = intersect
+
+        return hit
+
+    def any_hit(self, origin, direction, max_distance):
+        for i in self.traverse_objects(origin, direction, lambda: max_distance):
+            if self.objects[i].occludes(origin, direction, EPS, max_distance):
+                return True
+        return False
+
+    def closest_hit_batch(self, origins, directions):
+        origins = np.broadcast_to(origins, directions.shape)
+
+        if self.unbounded:
+            distances, normals, obj_ids = self.scene.closest_hit_batch(origins, directions, np.inf, self.unbounded)
+        else:
+            distances = np.full(len(directions), np.inf)
+            normals = np.zeros(directions.shape)
+            obj_ids = np.full(len(directions), -1)
+
+        # distances se actualiza en el lugar y recorta el recorrido del árbol
+        for items, rays in self.traverse_batch(origins, directions, distances):
+            d, n, ids = self.scene.closest_hit_batch(origins[rays], directions[rays], distances[rays],
+                                                     self.bounded_ids[items])
+            closer = ids >= 0
+            rays = rays[closer]
+            distances[rays] = d[closer]
+            normals[rays] = n[closer]
+            obj_ids[rays] = ids[closer]
+
+        return distances, normals, obj_ids
+
+    def any_hit_batch(self, origins, directions, max_distance):
+        origins = np.broadcast_to(origins, directions.shape)
+        t_max = np.full(len(directions), float(max_distance))
+
+        if self.unbounded:
+            blocked = self.scene.any_hit_batch(origins, directions, EPS, t_max, self.unbounded)
+        else:
+            blocked = np.zeros(len(directions), dtype=bool)
+
+        # Los rayos ya bloqueados dejan de recorrer el árbol
+        t_max[blocked] = -np.inf
+        for items, rays in self.traverse_batch(origins, directions, t_max):
+            rays = rays[~blocked[rays]]
+            if len(rays) == 0:
+                continue
+            hit = self.scene.any_hit_batch(origins[rays], directions[rays], EPS, t_max[rays],
+                                           self.bounded_ids[items])
+            rays = rays[hit]
+            blocked[rays] = True
+            t_max[rays] = -np.inf
+
+        return blocked
@@ -1,15 +1,23 @@
 import numpy as np
-from MathLib import TranslationMatrix, RotationMatrix
+from MathLib import Transform
 
 class Camera:
     def __init__(self):
+        # Listas como antes: se pueden modificar en su lugar (camera.translation[2] += 1)
         self.translation = [0, 0, 0]
         self.rotation = [0, 0, 0]
+        self._transform = Transform()
+
+    @property
+    def transform(self):
+        # Se sincroniza con las listas al pedirlo; la matriz solo se recalcula si algún valor cambió
+        self._transform.translation = self.translation
+        self._transform.rotation = self.rotation
+        return self._transform
 
     def get_view_matrix(self):
-        cam_matrix = TranslationMatrix(self.translation[0], self.translation[1], self.translation[2])
-        cam_matrix = cam_matrix * RotationMatrix(self.rotation[0], self.rotation[1], self.rotation[2])
-        return np.linalg.inv(cam_matrix)
+        # La inversa queda en caché hasta que la cámara se mueva
+        return self.transform.inverse
 
     def translate(self, x, y, z):
         self.translation[0] += x
@@ -19,4 +27,4 @@ class Camera:
     def rotate(self, x, y, z):
         self.rotation[0] += x
         self.rotation[1] += y
-        self.rotation[2] += z
\ No newline at end of file
+        self.rotation[2] += z
@@ -1,5 +1,7 @@
 import numpy as np
 from intercept import Intercept
+from MathLib import Transform
+from intersections import sphere_distances, triangle_distances, box_distances, box_normals
 
 class Material:
     def __init__(self, diffuse = [1,1,1], spec = 1.0, ks = 0.0, matType = "OPAQUE", ior = 1.0):
@@ -9,14 +11,82 @@ class Material:
         self.matType = matType
         self.ior = ior
 
+# Tipos de material como enteros para el sombreado por paquetes
+OPAQUE, REFLECTIVE, TRANSPARENT = 0, 1, 2
+MATERIAL_TYPES = {"OPAQUE": OPAQUE, "REFLECTIVE": REFLECTIVE, "TRANSPARENT": TRANSPARENT}
+
+class MaterialTable:
+    """Materiales registrados con un id entero; sus propiedades quedan en arreglos indexados por id"""
+
+    def __init__(self, materials = ()):
+        self.materials = []
+        self.ids = {}
+        for material in materials:
+            self.register(material)
+        self.freeze()
+
+    def register(self, material):
+        # El mismo objeto Material siempre recibe el mismo id
+        key = id(material)
+        if key not in self.ids:
+            self.ids[key] = len(self.materials)
+            self.materials.append(material)
+        return self.ids[key]
+
+    def freeze(self):
+        self.diffuse = np.array([m.diffuse for m in self.materials], dtype=float).reshape(-1, 3)
+        self.spec = np.array([m.spec for m in self.materials], dtype=float)
+        self.ks = np.array([m.ks for m in self.materials], dtype=float)
+        self.ior = np.array([m.ior for m in self.materials], dtype=float)
+        # Cualquier otro matType se sombrea como opaco
+        self.kind = np.array([MATERIAL_TYPES.get(m.matType, OPAQUE) for m in self.materials], dtype=np.int8)
+
+    def __len__(self):
+        return len(self.materials)
+
 class Shape(object):
     def __init__(self, position, material):
         self.position = position
         self.material = material
         self.type = "None"
 
-    def ray_intersect(self, ray_origin, ray_direction):
+    def bounds(self):
+        return None
+
+    def ray_intersect(self, ray_origin, ray_direction, t_max=float('inf')):
         return False
+
+    def hit_distance(self, ray_origin, ray_direction, t_max=float('inf')):
+        intersect = self.ray_intersect(ray_origin, ray_direction, t_max)
+        return intersect.distance if intersect else None
+
+    def occludes(self, ray_origin, ray_direction, t_min, t_max):
+        # Solo responde si hay algo entre t_min y t_max, sin armar el registro del choque
+        t = self.hit_distance(ray_origin, ray_direction, t_max)
+        return t is not None and t > t_min
+
+    def ray_intersect_batch(self, ray_origins, ray_directions, t_max=np.inf):
+        ray_origins = np.broadcast_to(ray_origins, ray_directions.shape)
+        t_max = np.broadcast_to(t_max, len(ray_directions))
+
+        distances = np.full(len(ray_directions), np.inf)
+        normals = np.zeros(ray_directions.shape)
+
+        for i in range(len(ray_directions)):
+            intersect = self.ray_intersect(ray_origins[i], ray_directions[i], t_max[i])
+            if intersect:
+                distances[i] = intersect.distance
+                normals[i] = intersect.normal
+
+        return distances, normals, np.isfinite(distances)
+
+    def hit_distance_batch(self, ray_origins, ray_directions, t_max=np.inf):
+        distances, _, hit = self.ray_intersect_batch(ray_origins, ray_directions, t_max)
+        return distances, hit
+
+    def occludes_batch(self, ray_origins, ray_directions, t_min, t_max):
+        distances, hit = self.hit_distance_batch(ray_origins, ray_directions, t_max)
+        return hit & (distances > t_min)
     
 class Sphere(Shape):
     def __init__(self, center, radius, material):
@@ -25,7 +95,10 @@ class Sphere(Shape):
         self.radius = radius
         self.type = "Sphere"
 
-    def ray_intersect(self, ray_origin, ray_direction):
+    def bounds(self):
+        return self.center - self.radius, self.center + self.radius
+
+    def hit_distance(self, ray_origin, ray_direction, t_max=float('inf')):
         ray_origin = np.array(ray_origin)
         ray_direction = np.array(ray_direction)
         
@@ -43,20 +116,42 @@ class Sphere(Shape):
         
         if t0 < 0:
             t0 = t1
-        if t0 < 0:
+        if t0 < 0 or t0 >= t_max:
+            return None
+
+        return t0
+
+    def ray_intersect(self, ray_origin, ray_direction, t_max=float('inf')):
+        t0 = self.hit_distance(ray_origin, ray_direction, t_max)
+        if t0 is None:
             return None
             
-        point = ray_origin + ray_direction * t0
+        point = np.array(ray_origin) + np.array(ray_direction) * t0
         normal = (point - self.center)
         normal = normal / np.linalg.norm(normal)
         
-        return {
-            'distance': t0,
-            'point': point,
-            'normal': normal,
-            'material': self.material,
-            'obj': self
-        }
+        return Intercept(distance=t0, point=point, normal=normal,
+                         rayDirection=ray_direction, obj=self)
+
+    def hit_distance_batch(self, ray_origins, ray_directions, t_max=np.inf):
+        ray_origins = np.broadcast_to(ray_origins, ray_directions.shape)
+
+        t = sphere_distances(ray_origins, ray_directions, self.center.reshape(1, 3).astype(float),
+                             np.array([self.radius**2], dtype=float))[:, 0]
+        hit = t < t_max
+
+        return np.where(hit, t, np.inf), hit
+
+    def ray_intersect_batch(self, ray_origins, ray_directions, t_max=np.inf):
+        ray_origins = np.broadcast_to(ray_origins, ray_directions.shape)
+        distances, hit = self.hit_distance_batch(ray_origins, ray_directions, t_max)
+        normals = np.zeros(ray_directions.shape)
+
+        points = ray_origins[hit] + ray_directions[hit] * distances[hit, None]
+        normal = points - self.center
+        normals[hit] = normal / np.linalg.norm(normal, axis=1)[:, None]
+
+        return distances, normals, hit
 
 class Plane(Shape):
     def __init__(self, position, normal, material):
@@ -65,7 +160,7 @@ class Plane(Shape):
         self.normal = np.array(normal) / np.linalg.norm(normal)
         self.type = "Plane"
 
-    def ray_intersect(self, ray_origin, ray_direction):
+    def hit_distance(self, ray_origin, ray_direction, t_max=float('inf')):
         ray_origin = np.array(ray_origin)
         ray_direction = np.array(ray_direction)
         
@@ -74,18 +169,38 @@ class Plane(Shape):
             return None
             
         t = np.dot(self.position - ray_origin, self.normal) / denom
-        if t < 0:
+        if t < 0 or t >= t_max:
+            return None
+
+        return t
+
+    def ray_intersect(self, ray_origin, ray_direction, t_max=float('inf')):
+        t = self.hit_distance(ray_origin, ray_direction, t_max)
+        if t is None:
             return None
             
-        point = ray_origin + ray_direction * t
+        point = np.array(ray_origin) + np.array(ray_direction) * t
         
-        return {
-            'distance': t,
-            'point': point,
-            'normal': self.normal,
-            'material': self.material,
-            'obj': self
-        }
+        return Intercept(distance=t, point=point, normal=self.normal,
+                         rayDirection=ray_direction, obj=self)
+
+    def hit_distance_batch(self, ray_origins, ray_directions, t_max=np.inf):
+        ray_origins = np.broadcast_to(ray_origins, ray_directions.shape)
+
+        denom = ray_directions @ self.normal
+        hit = np.abs(denom) >= 1e-6
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = ((self.position - ray_origins) @ self.normal) / denom
+        hit &= (t >= 0) & (t < t_max)
+
+        return np.where(hit, t, np.inf), hit
+
+    def ray_intersect_batch(self, ray_origins, ray_directions, t_max=np.inf):
+        distances, hit = self.hit_distance_batch(ray_origins, ray_directions, t_max)
+        normals = np.broadcast_to(self.normal, ray_directions.shape)
+
+        return distances, normals, hit
 
 class Disk(Shape):
     def __init__(self, position, normal, radius, material):
@@ -95,7 +210,11 @@ class Disk(Shape):
         self.radius = radius
         self.type = "Disk"
 
-    def ray_intersect(self, ray_origin, ray_direction):
+    def bounds(self):
+        extent = self.radius * np.sqrt(np.maximum(0, 1 - self.normal**2))
+        return self.position - extent, self.position + extent
+
+    def hit_distance(self, ray_origin, ray_direction, t_max=float('inf')):
         ray_origin = np.array(ray_origin)
         ray_direction = np.array(ray_direction)
         
@@ -104,7 +223,7 @@ class Disk(Shape):
             return None
             
         t = np.dot(self.position - ray_origin, self.normal) / denom
-        if t < 0:
+        if t < 0 or t >= t_max:
             return None
             
         point = ray_origin + ray_direction * t
@@ -112,14 +231,40 @@ class Disk(Shape):
         
         if distance_to_center > self.radius:
             return None
+
+        return t
+
+    def ray_intersect(self, ray_origin, ray_direction, t_max=float('inf')):
+        t = self.hit_distance(ray_origin, ray_direction, t_max)
+        if t is None:
+            return None
+
+        point = np.array(ray_origin) + np.array(ray_direction) * t
             
-        return {
-            'distance': t,
-            'point': point,
-            'normal': self.normal,
-            'material': self.material,
-            'obj': self
-        }
+        return Intercept(distance=t, point=point, normal=self.normal,
+                         rayDirection=ray_direction, obj=self)
+
+    def hit_distance_batch(self, ray_origins, ray_directions, t_max=np.inf):
+        ray_origins = np.broadcast_to(ray_origins, ray_directions.shape)
+
+        denom = ray_directions @ self.normal
+        hit = np.abs(denom) >= 1e-6
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = ((self.position - ray_origins) @ self.normal) / denom
+        hit &= (t >= 0) & (t < t_max)
+
+        points = ray_origins[hit] + ray_directions[hit] * t[hit, None]
+        distance_to_center = np.linalg.norm(points - self.position, axis=1)
+        hit[hit] = distance_to_center <= self.radius
+
+        return np.where(hit, t, np.inf), hit
+
+    def ray_intersect_batch(self, ray_origins, ray_directions, t_max=np.inf):
+        distances, hit = self.hit_distance_batch(ray_origins, ray_directions, t_max)
+        normals = np.broadcast_to(self.normal, ray_directions.shape)
+
+        return distances, normals, hit
 
 class Triangle(Shape):
     def __init__(self, v0, v1, v2, material):
@@ -129,7 +274,11 @@ class Triangle(Shape):
         self.v2 = np.array(v2)
         self.type = "Triangle"
 
-    def ray_intersect(self, ray_origin, ray_direction):
+    def bounds(self):
+        vertices = np.array([self.v0, self.v1, self.v2])
+        return vertices.min(axis=0), vertices.max(axis=0)
+
+    def hit_distance(self, ray_origin, ray_direction, t_max=float('inf')):
         ray_origin = np.array(ray_origin)
         ray_direction = np.array(ray_direction)
         
@@ -159,21 +308,42 @@ class Triangle(Shape):
             
         t = f * np.dot(edge2, q)
         
-        if t > epsilon:
-            point = ray_origin + ray_direction * t
-            normal = np.cross(edge1, edge2)
-            normal = normal / np.linalg.norm(normal)
-            
-            return {
-                'distance': t,
-                'point': point,
-                'normal': normal,
-                'material': self.material,
-                'obj': self
-            }
+        if epsilon < t < t_max:
+            return t
             
         return None
 
+    def ray_intersect(self, ray_origin, ray_direction, t_max=float('inf')):
+        t = self.hit_distance(ray_origin, ray_direction, t_max)
+        if t is None:
+            return None
+
+        point = np.array(ray_origin) + np.array(ray_direction) * t
+        normal = np.cross(self.v1 - self.v0, self.v2 - self.v0)
+        normal = normal / np.linalg.norm(normal)
+
+        return Intercept(distance=t, point=point, normal=normal,
+                         rayDirection=ray_direction, obj=self)
+
+    def hit_distance_batch(self, ray_origins, ray_directions, t_max=np.inf):
+        ray_origins = np.broadcast_to(ray_origins, ray_directions.shape)
+
+        v0 = np.asarray(self.v0, dtype=float)
+        edge1 = np.asarray(self.v1, dtype=float) - v0
+        edge2 = np.asarray(self.v2, dtype=float) - v0
+
+        t = triangle_distances(ray_origins, ray_directions, v0[None], edge1[None], edge2[None])[:, 0]
+        hit = t < t_max
+
+        return np.where(hit, t, np.inf), hit
+
+    def ray_intersect_batch(self, ray_origins, ray_directions, t_max=np.inf):
+        distances, hit = self.hit_distance_batch(ray_origins, ray_directions, t_max)
+        normal = np.cross(self.v1 - self.v0, self.v2 - self.v0)
+        normals = np.broadcast_to(normal / np.linalg.norm(normal), ray_directions.shape)
+
+        return distances, normals, hit
+
 class Cube(Shape):
     def __init__(self, position, size, material):
         super().__init__(position, material)
@@ -181,7 +351,11 @@ class Cube(Shape):
         self.size = size
         self.type = "Cube"
 
-    def ray_intersect(self, ray_origin, ray_direction):
+    def bounds(self):
+        half_size = self.size / 2
+        return self.position - half_size, self.position + half_size
+
+    def hit_distance(self, ray_origin, ray_direction, t_max=float('inf')):
         ray_origin = np.array(ray_origin)
         ray_direction = np.array(ray_direction)
         
@@ -202,10 +376,21 @@ class Cube(Shape):
             return None
             
         t = tnear if tnear > 0 else tfar
-        if t < 0:
+        if t < 0 or t >= t_max:
             return None
+
+        return t
+
+    def ray_intersect(self, ray_origin, ray_direction, t_max=float('inf')):
+        t = self.hit_distance(ray_origin, ray_direction, t_max)
+        if t is None:
+            return None
+
+        half_size = self.size / 2
+        min_bounds = self.position - half_size
+        max_bounds = self.position + half_size
             
-        point = ray_origin + ray_direction * t
+        point = np.array(ray_origin) + np.array(ray_direction) * t
         
         normal = np.array([0.0, 0.0, 0.0])
         for i in range(3):
@@ -219,10 +404,115 @@ class Cube(Shape):
         if np.linalg.norm(normal) == 0:
             normal = np.array([1, 0, 0])
         
-        return {
-            'distance': t,
-            'point': point,
-            'normal': normal,
-            'material': self.material,
-            'obj': self
-        }
\ No newline at end of file
+        return Intercept(distance=t, point=point, normal=normal,
+                         rayDirection=ray_direction, obj=self)
+
+    def hit_distance_batch(self, ray_origins, ray_directions, t_max=np.inf):
+        ray_origins = np.broadcast_to(ray_origins, ray_directions.shape)
+
+        half_size = self.size / 2
+        min_bounds = np.asarray(self.position - half_size, dtype=float)
+        max_bounds = np.asarray(self.position + half_size, dtype=float)
+
+        t = box_distances(ray_origins, ray_directions, min_bounds[None], max_bounds[None])[:, 0]
+        hit = t < t_max
+
+        return np.where(hit, t, np.inf), hit
+
+    def ray_intersect_batch(self, ray_origins, ray_directions, t_max=np.inf):
+        ray_origins = np.broadcast_to(ray_origins, ray_directions.shape)
+        distances, hit = self.hit_distance_batch(ray_origins, ray_directions, t_max)
+
+        half_size = self.size / 2
+        min_bounds = self.position - half_size
+        max_bounds = self.position + half_size
+
+        normals = np.zeros(ray_directions.shape)
+
+        points = ray_origins[hit] + ray_directions[hit] * distances[hit, None]
+        normals[hit] = box_normals(points, min_bounds, max_bounds)
+
+        return distances, normals, hit
+
+class Instance(Shape):
+    """Copia de una figura o malla con su propia transformación.
+    La geometría se guarda una sola vez; cada instancia solo guarda la matriz y su inversa,
+    y los rayos se llevan a espacio de objeto."""
+
+    def __init__(self, shape, translate = (0, 0, 0), rotate = (0, 0, 0), scale = (1, 1, 1), material = None):
+        super().__init__(translate, material or shape.material)
+        self.shape = shape
+        # Listas como en Camera: se pueden modificar en su lugar (model.translate[0] += 1)
+        self.translate = list(translate)
+        self.rotate = list(rotate)
+        self.scale = list(scale)
+        self._transform = Transform(translate, rotate, scale)
+        self.type = "Instance"
+
+    @property
+    def transform(self):
+        # Se sincroniza con las listas al pedirlo; la matriz solo se recalcula si algún valor cambió.
+        # Una escena ya compilada necesita compile() para ver los nuevos límites
+        self._transform.translation = self.translate
+        self._transform.rotation = self.rotate
+        self._transform.scale = self.scale
+        return self._transform
+
+    def object_rays(self, ray_origins, ray_directions):
+        transform = self.transform
+        origins = transform.inverse_transform_points(ray_origins)
+        directions = transform.inverse_transform_directions(ray_directions)
+
+        # La dirección se normaliza en espacio de objeto; las distancias se dividen
+        # entre lengths para volver a espacio de mundo
+        lengths = np.linalg.norm(directions, axis=-1)
+        return origins, directions / np.expand_dims(lengths, -1), lengths
+
+    def bounds(self):
+        bounds = self.shape.bounds()
+        if bounds is None:
+            return None
+
+        # Caja de mundo que contiene las 8 esquinas transformadas
+        low, high = np.asarray(bounds[0], dtype=float), np.asarray(bounds[1], dtype=float)
+        corners = np.array([[x, y, z] for x in (low[0], high[0]) for y in (low[1], high[1]) for z in (low[2], high[2])])
+        corners = self.transform.transform_points(corners)
+        return corners.min(axis=0), corners.max(axis=0)
+
+    def hit_distance(self, ray_origin, ray_direction, t_max=float('inf')):
+        origin, direction, length = self.object_rays(ray_origin, ray_direction)
+        t = self.shape.hit_distance(origin, direction, t_max * length)
+        return None if t is None else t / length
+
+    def ray_intersect(self, ray_origin, ray_direction, t_max=float('inf')):
+        origin, direction, length = self.object_rays(ray_origin, ray_direction)
+        intersect = self.shape.ray_intersect(origin, direction, t_max * length)
+        if not intersect:
+            return None
+
+        distance = intersect.distance / length
+        ray_direction = np.asarray(ray_direction, dtype=float)
+        return Intercept(distance=distance, point=np.asarray(ray_origin, dtype=float) + ray_direction * distance,
+                         normal=self.transform.transform_normals(intersect.normal),
+                         rayDirection=ray_direction, obj=self)
+
+    def occludes(self, ray_origin, ray_direction, t_min, t_max):
+        origin, direction, length = self.object_rays(ray_origin, ray_direction)
+        return self.shape.occludes(origin, direction, t_min * length, t_max * length)
+
+    def ray_intersect_batch(self, ray_origins, ray_directions, t_max=np.inf):
+        origins, directions, lengths = self.object_rays(ray_origins, ray_directions)
+        distances, normals, hit = self.shape.ray_intersect_batch(origins, directions, t_max * lengths)
+
+        normals = np.array(normals, dtype=float)
+        normals[hit] = self.transform.transform_normals(normals[hit])
+        return distances / lengths, normals, hit
+
+    def hit_distance_batch(self, ray_origins, ray_directions, t_max=np.inf):
+        origins, directions, lengths = self.object_rays(ray_origins, ray_directions)
+        distances, hit = self.shape.hit_distance_batch(origins, directions, t_max * lengths)
+        return distances / lengths, hit
+
+    def occludes_batch(self, ray_origins, ray_directions, t_min, t_max):
+        origins, directions, lengths = self.object_rays(ray_origins, ray_directions)
+        return self.shape.occludes_batch(origins, directions, t_min * lengths, t_max * lengths)
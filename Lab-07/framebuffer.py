@@ -0,0 +1,46 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+class SharedFramebuffer:
+    """Framebuffer (height, width, 3) en memoria compartida; los procesos escriben sus tiles en el mismo buffer"""
+
+    def __init__(self, width, height, channels=3, dtype=np.uint8):
+        self.width = width
+        self.height = height
+        self.shape = (height, width, channels)
+        self.dtype = np.dtype(dtype)
+        self.owner = True
+
+        size = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+        self.array.fill(0)
+
+    def __getstate__(self):
+        # Solo se envía el nombre del bloque, nunca los píxeles
+        return {"name": self.shm.name, "shape": self.shape, "dtype": self.dtype.str}
+
+    def __setstate__(self, state):
+        self.shape = tuple(state["shape"])
+        self.height, self.width = self.shape[:2]
+        self.dtype = np.dtype(state["dtype"])
+        self.owner = False
+
+        # Solo el proceso que lo creó lo libera con unlink
+        self.shm = shared_memory.SharedMemory(name=state["name"])
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    def matches(self, width, height, dtype=np.uint8):
+        return self.width == width and self.height == height and self.dtype == np.dtype(dtype)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def release(self):
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
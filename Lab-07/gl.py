@@ -1,7 +1,7 @@
 import numpy as np
 from math import isclose, floor, ceil, tan, pi
 from camera import Camera
-import random
+import time
 import pygame
 from figures import *
 from lights import *
@@ -18,6 +18,11 @@ class Renderer:
         self.glColor(1, 1, 1)
         self.glClearColor(0, 0, 0)
 
+        # La superficie se actualiza en cada escritura; display.flip() como máximo una vez por intervalo
+        self.frameInterval = 1 / 60
+        self.lastPresent = 0
+        self.dirty = False
+
         self.glClear()
 
         self.scene = []
@@ -27,8 +32,30 @@ class Renderer:
         color = [int(i * 255) for i in self.clearColor]
         self.screen.fill(color)
 
-        self.frameBuffer = [[color for y in range(self.height)]
-                            for x in range(self.width)]
+        # frameBuffer[x, y] con y hacia arriba, igual que glPoint
+        self.frameBuffer = np.empty((self.width, self.height, 3), dtype=np.uint8)
+        self.frameBuffer[:, :] = color
+        self.dirty = False
+
+    def glUpdate(self, x0, y0, x1, y1):
+        # Copia la región x0 <= x < x1, y0 <= y < y1 del frameBuffer a la superficie (y hacia arriba)
+        region = pygame.surfarray.make_surface(self.frameBuffer[x0:x1, y0:y1][:, ::-1])
+        self.screen.blit(region, (x0, self.height - y1))
+        self.dirty = True
+
+    def glPresent(self, force = False):
+        now = time.perf_counter()
+        if not self.dirty or (not force and now - self.lastPresent < self.frameInterval):
+            return False
+
+        pygame.display.flip()
+
+        self.lastPresent = now
+        self.dirty = False
+        return True
+
+    def toBytes(self, colors):
+        return (np.clip(np.asarray(colors, dtype=float), 0, 1) * 255).astype(np.uint8)
 
     def glViewport(self, x, y, width, height):
         self.vpX = round(x)
@@ -36,7 +63,7 @@ class Renderer:
         self.vpWidth = round(width)
         self.vpHeight = round(height)
 
-        self.viewportMatrix = np.matrix([[width/2, 0, 0, x + width/2],
+        self.viewportMatrix = np.array([[width/2, 0, 0, x + width/2],
                                           [0, height/2, 0, y + height/2],
                                           [0, 0, 0, 1]])
 
@@ -49,7 +76,7 @@ class Renderer:
         self.nearPlane = n
         self.farPlane = f
 
-        self.projectionMatrix = np.matrix([[n/self.rightEdge, 0, 0, 0],
+        self.projectionMatrix = np.array([[n/self.rightEdge, 0, 0, 0],
                                            [0, n/self.topEdge, 0, 0],
                                            [0, 0, (f + n) / (n - f), -(2 * f * n) / (f - n)],
                                            [0, 0, -1, 0]])
@@ -69,7 +96,63 @@ class Renderer:
 
             self.screen.set_at((x, self.height - y - 1), color)
 
-            self.frameBuffer[x][y] = color
+            self.frameBuffer[x, y] = color
+            self.dirty = True
+            self.glPresent()
+
+    def glPoints(self, xs, ys, colors = None):
+        xs = np.round(np.asarray(xs)).astype(int)
+        ys = np.round(np.asarray(ys)).astype(int)
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+
+        colors = self.toBytes(self.color if colors is None else colors)
+        if colors.ndim > 1:
+            colors = colors[inside]
+
+        xs = xs[inside]
+        ys = ys[inside]
+        if len(xs) == 0:
+            return
+
+        self.frameBuffer[xs, ys] = colors
+        self.glUpdate(xs.min(), ys.min(), xs.max() + 1, ys.max() + 1)
+        self.glPresent(force = True)
+
+    def glSpan(self, y, x0, x1, colors = None):
+        # Pixeles x0 <= x < x1 de la fila y; colors es un color o uno por pixel
+        y = round(y)
+        if not (0 <= y < self.height):
+            return
+
+        colors = self.toBytes(self.color if colors is None else colors)
+        start = max(0, round(x0))
+        end = min(self.width, round(x1))
+        if start >= end:
+            return
+
+        if colors.ndim > 1:
+            colors = colors[start - round(x0):end - round(x0)]
+
+        self.frameBuffer[start:end, y] = colors
+        self.glUpdate(start, y, end, y + 1)
+        self.glPresent(force = True)
+
+    def glBlock(self, x, y, colors):
+        # colors es un arreglo (ancho, alto, 3) con valores entre 0 y 1
+        colors = self.toBytes(colors)
+        x = round(x)
+        y = round(y)
+
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = min(self.width, x + colors.shape[0])
+        y1 = min(self.height, y + colors.shape[1])
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        self.frameBuffer[x0:x1, y0:y1] = colors[x0 - x:x1 - x, y0 - y:y1 - y]
+        self.glUpdate(x0, y0, x1, y1)
+        self.glPresent(force = True)
 
     def glLine(self, p0, p1, color = None):
         x0 = p0[0]
@@ -79,6 +162,7 @@ class Renderer:
 
         if x0 == x1 and y0 == y1:
             self.glPoint(x0, y0)
+            self.glPresent(force = True)
             return
         
         dy = abs(y1 - y0)
@@ -118,41 +202,55 @@ class Renderer:
                 
                 limit += 1
 
-    def glRender(self):
-        indices = [(i, j) for i in range(self.vpWidth) for j in range(self.vpHeight)]
+        # El último tramo de la línea puede haber quedado sin mostrar por el intervalo
+        self.glPresent(force = True)
 
-        random.shuffle(indices)
+    def glRender(self):
+        xs = np.arange(self.vpX, self.vpX + self.vpWidth)
+        ys = np.arange(self.vpY, self.vpY + self.vpHeight)
+        xs = xs[(xs >= 0) & (xs < self.width)]
+        ys = ys[(ys >= 0) & (ys < self.height)]
 
-        for i, j in indices:
-            x = i + self.vpX
-            y = j + self.vpY
+        x, y = np.meshgrid(xs, ys, indexing='ij')
+        x = x.ravel()
+        y = y.ravel()
 
-            if 0 <= x < self.width and 0 <= y < self.height:
-                pX = ((x + 0.5 - self.vpX) / self.vpWidth) * 2 - 1
-                pY = ((y + 0.5 - self.vpY) / self.vpHeight) * 2 - 1
+        pX = ((x + 0.5 - self.vpX) / self.vpWidth) * 2 - 1
+        pY = ((y + 0.5 - self.vpY) / self.vpHeight) * 2 - 1
 
-                pX *= self.rightEdge
-                pY *= self.topEdge
-                pZ = -self.nearPlane
+        dirs = np.stack([pX * self.rightEdge, pY * self.topEdge, np.full(len(x), -self.nearPlane)], axis=1)
+        dirs = dirs / np.linalg.norm(dirs, axis=1)[:, None]
 
-                dir = np.array([pX, pY, pZ])
-                dir = dir / np.linalg.norm(dir)
+        objIds = self.glCastRayBatch(np.array(self.camera.translation, dtype=float), dirs)
 
-                hit = self.glCastRay(self.camera.translation, dir)
+        for i, obj in enumerate(self.scene):
+            hit = objIds == i
+            if hit.any():
+                self.frameBuffer[x[hit], y[hit]] = self.toBytes(obj.material.diffuse)
 
-                if hit:
-                    color = hit['material'].diffuse
-                    self.glPoint(x, y, color)
-                    pygame.display.flip()
+        if len(xs) and len(ys):
+            self.glUpdate(xs[0], ys[0], xs[-1] + 1, ys[-1] + 1)
+        self.glPresent(force = True)
 
     def glCastRay(self, origin, direction):
         min_distance = float('inf')
         hit = None
 
         for obj in self.scene:
-            intersect = obj.ray_intersect(origin, direction)
-            if intersect and intersect['distance'] < min_distance:
-                min_distance = intersect['distance']
+            intersect = obj.ray_intersect(origin, direction, min_distance)
+            if intersect:
+                min_distance = intersect.distance
                 hit = intersect
                 
-        return hit
\ No newline at end of file
+        return hit
+
+    def glCastRayBatch(self, origins, directions):
+        distances = np.full(len(directions), np.inf)
+        objIds = np.full(len(directions), -1)
+
+        for i, obj in enumerate(self.scene):
+            d, _, closer = obj.ray_intersect_batch(origins, directions, distances)
+            distances[closer] = d[closer]
+            objIds[closer] = i
+
+        return objIds
@@ -1,7 +1,14 @@
 class Intercept(object):
+    # Registro de choque con __slots__: sin diccionario por instancia
+    __slots__ = ("distance", "point", "normal", "rayDirection", "obj")
+
     def __init__(self, distance, point, normal, rayDirection, obj):
         self.distance = distance
         self.point = point
         self.normal = normal
         self.rayDirection = rayDirection
-        self.obj = obj
\ No newline at end of file
+        self.obj = obj
+
+    @property
+    def material(self):
+        return self.obj.material
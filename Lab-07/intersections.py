@@ -0,0 +1,77 @@
+import numpy as np
+
+# Núcleos de intersección (rayos x figuras): origins y directions son (R, 3),
+# los parámetros de las figuras son (K, ...). Devuelven distancias (R, K) con inf donde no hay choque.
+# Los usan las figuras sueltas (K = 1), los grupos de la escena compilada y las mallas.
+
+def sphere_distances(origins, directions, centers, radii2):
+    # L = centro - origen se expande para usar productos matriciales
+    tca = directions @ centers.T - np.einsum('ij,ij->i', origins, directions)[:, None]
+
+    L2 = np.einsum('ij,ij->i', centers, centers) - 2 * (origins @ centers.T) + np.einsum('ij,ij->i', origins, origins)[:, None]
+    d = L2 - tca**2
+    hit = d <= radii2
+
+    thc = np.sqrt(np.maximum(radii2 - d, 0))
+    t0 = tca - thc
+    t1 = tca + thc
+
+    t0 = np.where(t0 < 0, t1, t0)
+    hit &= t0 >= 0
+
+    return np.where(hit, t0, np.inf)
+
+def triangle_distances(origins, directions, v0, edge1, edge2):
+    # Möller–Trumbore
+    epsilon = 1e-8
+
+    h = np.cross(directions[:, None, :], edge2[None, :, :])
+    a = np.einsum('rkj,kj->rk', h, edge1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f = 1.0 / a
+        s = origins[:, None, :] - v0[None, :, :]
+        u = f * np.einsum('rkj,rkj->rk', s, h)
+
+        q = np.cross(s, edge1[None, :, :])
+        v = f * np.einsum('rj,rkj->rk', directions, q)
+
+        t = f * np.einsum('rkj,kj->rk', q, edge2)
+
+    hit = (np.abs(a) >= epsilon) & (u >= 0.0) & (u <= 1.0) & (v >= 0.0) & (u + v <= 1.0) & (t > epsilon)
+    return np.where(hit, t, np.inf)
+
+def box_distances(origins, directions, mins, maxs):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tmin = (mins[None, :, :] - origins[:, None, :]) / directions[:, None, :]
+        tmax = (maxs[None, :, :] - origins[:, None, :]) / directions[:, None, :]
+
+    t1 = np.minimum(tmin, tmax)
+    t2 = np.maximum(tmin, tmax)
+
+    tnear = np.max(t1, axis=2)
+    tfar = np.min(t2, axis=2)
+
+    hit = (tnear <= tfar) & (tfar >= 0)
+    t = np.where(tnear > 0, tnear, tfar)
+    hit &= t >= 0
+
+    return np.where(hit, t, np.inf)
+
+def box_normals(points, mins, maxs):
+    # Normal de la cara en la que cae cada punto; mins y maxs son uno por punto o uno para todos
+    mins = np.broadcast_to(mins, points.shape)
+    maxs = np.broadcast_to(maxs, points.shape)
+
+    normals = np.zeros(points.shape)
+    found = np.zeros(len(points), dtype=bool)
+    for i in range(3):
+        on_min = ~found & (np.abs(points[:, i] - mins[:, i]) < 1e-6)
+        normals[on_min, i] = -1
+        found |= on_min
+        on_max = ~found & (np.abs(points[:, i] - maxs[:, i]) < 1e-6)
+        normals[on_max, i] = 1
+        found |= on_max
+
+    normals[~found, 0] = 1
+    return normals
@@ -1,70 +1,151 @@
+import os
 import numpy as np
 from obj import Obj
+from bvh import BVH
+from figures import Material, Shape, Instance
+from intercept import Intercept
+from intersections import triangle_distances
 
-class Model:
-    def __init__(self, filename, translate = [0, 0, 0], rotate = [0, 0, 0], scale = [1, 1, 1]):
+class Mesh(Shape):
+    """Triángulos de un OBJ en espacio de objeto con su BVH.
+    Se carga una vez por archivo y la comparten todas las instancias (Model) que lo usan."""
+
+    cache = {}
+
+    @classmethod
+    def load(cls, filename):
+        # Si el archivo cambia en disco se vuelve a cargar
+        stat = os.stat(filename)
+        key = (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+        if key not in cls.cache:
+            cls.cache[key] = cls(filename)
+        return cls.cache[key]
+
+    def __init__(self, filename, material = None):
+        super().__init__((0, 0, 0), material or Material())
         self.model = Obj(filename)
-        self.translate = translate
-        self.rotate = rotate
-        self.scale = scale
-
-    def ray_intersect(self, ray_origin, ray_direction):
-        min_distance = float('inf')
-        intersect = None
-        
-        for face in self.model.faces:
-            vertices = []
-            for vertex_index in face:
-                vertex = self.model.vertices[vertex_index[0] - 1]
-                vertices.append(vertex)
-            
-            if len(vertices) >= 3:
-                hit = self.triangle_intersect(ray_origin, ray_direction, vertices[0], vertices[1], vertices[2])
-                if hit and hit['distance'] < min_distance:
-                    min_distance = hit['distance']
-                    intersect = hit
-                    
-        return intersect
-
-#Para otro momento
-'''
-    def triangle_intersect(self, ray_origin, ray_direction, v0, v1, v2):
-        epsilon = 1e-8
-        
-        edge1 = np.subtract(v1, v0)
-        edge2 = np.subtract(v2, v0)
-        
-        h = np.cross(ray_direction, edge2)
-        a = np.dot(edge1, h)
-        
-        if -epsilon < a < epsilon:
-            return None
-            
-        f = 1.0 / a
-        s = np.subtract(ray_origin, v0)
-        u = f * np.dot(s, h)
-        
-        if u < 0.0 or u > 1.0:
-            return None
-            
-        q = np.cross(s, edge1)
-        v = f * np.dot(ray_direction, q)
-        
-        if v < 0.0 or u + v > 1.0:
+        self.type = "Mesh"
+
+        self.load_triangles()
+
+        # BVH de triángulos propio de la malla, se construye una sola vez
+        v1 = self.v0 + self.edge1
+        v2 = self.v0 + self.edge2
+        self.bvh = BVH(np.minimum(np.minimum(self.v0, v1), v2), np.maximum(np.maximum(self.v0, v1), v2),
+                       max_leaf_size=32, traversal_cost=8.0)
+
+    def load_triangles(self):
+        vertices = np.asarray(self.model.vertices, dtype=float)
+        self.vertices = vertices.astype(np.float32)
+        self.indices = self.model.faces
+
+        v0 = vertices[self.indices[:, 0]]
+        v1 = vertices[self.indices[:, 1]]
+        v2 = vertices[self.indices[:, 2]]
+
+        edge1 = v1 - v0
+        edge2 = v2 - v0
+
+        normals = np.cross(edge1, edge2)
+        lengths = np.linalg.norm(normals, axis=1)[:, None]
+        normals = np.divide(normals, lengths, out=np.zeros(normals.shape), where=lengths > 0)
+
+        self.v0 = v0.astype(np.float32)
+        self.edge1 = edge1.astype(np.float32)
+        self.edge2 = edge2.astype(np.float32)
+        self.normals = normals.astype(np.float32)
+
+    def bounds(self):
+        return self.bvh.bounds()
+
+    def triangle_intersect(self, ray_origin, ray_direction, triangles):
+        return self.triangle_intersect_batch(ray_origin[None], ray_direction[None], triangles)[0]
+
+    def ray_intersect(self, ray_origin, ray_direction, t_max=float('inf')):
+        ray_origin = np.array(ray_origin, dtype=float)
+        ray_direction = np.array(ray_direction, dtype=float)
+
+        min_distance = t_max
+        triangle = -1
+
+        for triangles in self.bvh.traverse(ray_origin, ray_direction, lambda: min_distance):
+            t = self.triangle_intersect(ray_origin, ray_direction, triangles)
+            i = int(np.argmin(t))
+            if t[i] < min_distance:
+                min_distance = float(t[i])
+                triangle = triangles[i]
+
+        if triangle < 0:
             return None
-            
-        t = f * np.dot(edge2, q)
-        
-        if t > epsilon:
-            point = np.add(ray_origin, np.multiply(ray_direction, t))
-            normal = np.cross(edge1, edge2)
-            normal = normal / np.linalg.norm(normal)
-            
-            return {
-                'distance': t,
-                'point': point,
-                'normal': normal
-            }
-            
-        return None
-'''
\ No newline at end of file
+
+        return Intercept(distance=min_distance, point=ray_origin + ray_direction * min_distance,
+                         normal=self.normals[triangle], rayDirection=ray_direction, obj=self)
+
+    def occludes(self, ray_origin, ray_direction, t_min, t_max):
+        ray_origin = np.array(ray_origin, dtype=float)
+        ray_direction = np.array(ray_direction, dtype=float)
+
+        # Basta con el primer triángulo dentro del intervalo, no hace falta el más cercano
+        for triangles in self.bvh.traverse(ray_origin, ray_direction, lambda: t_max):
+            t = self.triangle_intersect(ray_origin, ray_direction, triangles)
+            if np.any((t > t_min) & (t < t_max)):
+                return True
+
+        return False
+
+    def triangle_intersect_batch(self, ray_origins, ray_directions, triangles):
+        return triangle_distances(ray_origins, ray_directions, self.v0[triangles], self.edge1[triangles], self.edge2[triangles])
+
+    def ray_intersect_batch(self, ray_origins, ray_directions, t_max=np.inf):
+        ray_origins = np.broadcast_to(ray_origins, ray_directions.shape)
+        t_max = np.array(np.broadcast_to(t_max, len(ray_directions)), dtype=float)
+
+        distances = np.full(len(ray_directions), np.inf)
+        triangle_ids = np.full(len(ray_directions), -1)
+
+        for triangles, rays in self.bvh.traverse_batch(ray_origins, ray_directions, t_max):
+            t = self.triangle_intersect_batch(ray_origins[rays], ray_directions[rays], triangles)
+            nearest = np.argmin(t, axis=1)
+            t = t[np.arange(len(rays)), nearest]
+
+            closer = t < t_max[rays]
+            rays = rays[closer]
+            t_max[rays] = t[closer]
+            distances[rays] = t[closer]
+            triangle_ids[rays] = triangles[nearest[closer]]
+
+        hit = triangle_ids >= 0
+        normals = np.zeros(ray_directions.shape)
+        normals[hit] = self.normals[triangle_ids[hit]]
+
+        return distances, normals, hit
+
+    def occludes_batch(self, ray_origins, ray_directions, t_min, t_max):
+        ray_origins = np.broadcast_to(ray_origins, ray_directions.shape)
+        t_min = np.broadcast_to(t_min, len(ray_directions))
+        t_max = np.array(np.broadcast_to(t_max, len(ray_directions)), dtype=float)
+        blocked = np.zeros(len(ray_directions), dtype=bool)
+
+        # Los rayos bloqueados quedan con t_max = -inf y ya no bajan por el árbol
+        for triangles, rays in self.bvh.traverse_batch(ray_origins, ray_directions, t_max):
+            rays = rays[~blocked[rays]]
+            t = self.triangle_intersect_batch(ray_origins[rays], ray_directions[rays], triangles)
+            rays = rays[np.any((t > t_min[rays, None]) & (t < t_max[rays, None]), axis=1)]
+            blocked[rays] = True
+            t_max[rays] = -np.inf
+
+        return blocked
+
+class Model(Instance):
+    """Instancia de un OBJ: la malla y su BVH se comparten, la transformación se aplica a los rayos"""
+
+    def __init__(self, filename, translate = [0, 0, 0], rotate = [0, 0, 0], scale = [1, 1, 1], material = None):
+        super().__init__(Mesh.load(filename), translate, rotate, scale, material or Material())
+        self.type = "Model"
+
+    @property
+    def mesh(self):
+        return self.shape
+
+    def model_matrix(self):
+        return self.transform.matrix
@@ -1,39 +1,150 @@
+import os
+import json
+import numpy as np
+
+CACHE_MAGIC = b"OBJCACHE"
+CACHE_VERSION = 1
+CACHE_ALIGN = 64
+CACHE_ARRAYS = ("vertices", "texcoords", "normals", "faces", "face_texcoords", "face_normals")
+
 class Obj:
-    def __init__(self, filename):
+    def __init__(self, filename, cache = True):
         self.vertices = []
         self.normals = []
         self.texcoords = []
         self.faces = []
 
-        self.read(filename)
+        self.cache_path = filename + ".cache"
+
+        if not (cache and self.load_cache(filename)):
+            self.read(filename)
+            if cache:
+                self.write_cache(filename)
+
+    def cache_key(self, filename):
+        stat = os.stat(filename)
+        return {
+            "path": os.path.abspath(filename),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "version": CACHE_VERSION
+        }
+
+    def cache_data_start(self, header_size):
+        # Los arreglos empiezan alineados después del encabezado
+        start = len(CACHE_MAGIC) + 4 + header_size
+        return -(-start // CACHE_ALIGN) * CACHE_ALIGN
+
+    def load_cache(self, filename):
+        # Carga los arreglos como memmap, sin copiar ni volver a parsear el texto
+        try:
+            with open(self.cache_path, "rb") as file:
+                if file.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+                    return False
+                header_size = int.from_bytes(file.read(4), "little")
+                header = json.loads(file.read(header_size))
+        except (OSError, ValueError):
+            return False
+
+        if header.get("key") != self.cache_key(filename):
+            return False
+
+        data_start = self.cache_data_start(header_size)
+        arrays = {}
+        try:
+            for name in CACHE_ARRAYS:
+                info = header["arrays"][name]
+                shape = tuple(info["shape"])
+                if 0 in shape:
+                    arrays[name] = np.zeros(shape, dtype=info["dtype"])
+                else:
+                    arrays[name] = np.memmap(self.cache_path, dtype=info["dtype"], mode="r",
+                                             offset=data_start + info["offset"], shape=shape)
+        except (KeyError, OSError, ValueError):
+            return False
+
+        for name, array in arrays.items():
+            setattr(self, name, array)
+        return True
+
+    def write_cache(self, filename):
+        arrays = {}
+        offset = 0
+        for name in CACHE_ARRAYS:
+            array = getattr(self, name)
+            arrays[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset += -(-array.nbytes // CACHE_ALIGN) * CACHE_ALIGN
+
+        header = {"key": self.cache_key(filename), "arrays": arrays}
+        header_bytes = json.dumps(header).encode("ascii")
+        data_start = self.cache_data_start(len(header_bytes))
+
+        # Se escribe a un archivo temporal para no dejar un caché a medias
+        temp_path = self.cache_path + ".tmp"
+        try:
+            with open(temp_path, "wb") as file:
+                file.write(CACHE_MAGIC)
+                file.write(len(header_bytes).to_bytes(4, "little"))
+                file.write(header_bytes)
+                for name in CACHE_ARRAYS:
+                    file.seek(data_start + arrays[name]["offset"])
+                    file.write(np.ascontiguousarray(getattr(self, name)).tobytes())
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            pass
 
     def read(self, filename):
         with open(filename, "r") as file:
             lines = file.read().splitlines()
 
+        vertices = []
+        texcoords = []
+        normals = []
+        corners = []
+
+        def index(value, count):
+            # Índices de OBJ: base 1, negativos relativos al final, -1 si no hay
+            if not value:
+                return -1
+            i = int(value)
+            return i - 1 if i > 0 else count + i
+
         for line in lines:
-            words = line.split(' ')
-            words = [word for word in words if word != '']
+            words = line.split()
 
             if len(words) > 0:
                 if words[0] == 'v':
-                    self.vertices.append([float(words[1]), float(words[2]), float(words[3])])
+                    vertices.extend((float(words[1]), float(words[2]), float(words[3])))
 
                 elif words[0] == 'vt':
                     u = float(words[1]) if len(words) > 1 else 0
                     v = float(words[2]) if len(words) > 2 else 0
-                    self.texcoords.append([u, v])
+                    texcoords.extend((u, v))
 
                 elif words[0] == 'vn':
-                    self.normals.append([float(words[1]), float(words[2]), float(words[3])])
+                    normals.extend((float(words[1]), float(words[2]), float(words[3])))
 
                 elif words[0] == 'f':
                     face = []
                     for i in range(1, len(words)):
                         w = words[i].split('/')
-                        face.append([
-                            int(w[0]) if w[0] else None,
-                            int(w[1]) if len(w) > 1 and w[1] else None,
-                            int(w[2]) if len(w) > 2 and w[2] else None
-                        ])
-                    self.faces.append(face)
\ No newline at end of file
+                        face.append((
+                            index(w[0], len(vertices) // 3),
+                            index(w[1] if len(w) > 1 else '', len(texcoords) // 2),
+                            index(w[2] if len(w) > 2 else '', len(normals) // 3)
+                        ))
+
+                    # Cuadriláteros y polígonos se triangulan en abanico
+                    for i in range(1, len(face) - 1):
+                        corners.extend(face[0])
+                        corners.extend(face[i])
+                        corners.extend(face[i + 1])
+
+        self.vertices = np.array(vertices, dtype=np.float32).reshape(-1, 3)
+        self.texcoords = np.array(texcoords, dtype=np.float32).reshape(-1, 2)
+        self.normals = np.array(normals, dtype=np.float32).reshape(-1, 3)
+
+        corners = np.array(corners, dtype=np.int32).reshape(-1, 3, 3)
+        self.faces = np.ascontiguousarray(corners[:, :, 0])
+        self.face_texcoords = np.ascontiguousarray(corners[:, :, 1])
+        self.face_normals = np.ascontiguousarray(corners[:, :, 2])
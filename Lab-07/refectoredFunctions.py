@@ -45,6 +45,64 @@ def fresnel(incident, normal, n1, n2):
 
     return np.clip((r_s + r_p) * 0.5, 0.0, 1.0)
 
+def normalize_batch(v):
+    v = np.asarray(v, dtype=np.float64)
+    n = np.linalg.norm(v, axis=1)[:, None]
+    return np.divide(v, n, out=v.copy(), where=n > 0)
+
+# Las versiones por lotes reciben arreglos (N, 3). Con normalized=True se asume que
+# incident y normal ya son unitarios y no se vuelven a normalizar.
+
+def reflect_batch(incident, normal, normalized=False):
+    i, n = (incident, normal) if normalized else (normalize_batch(incident), normalize_batch(normal))
+    return i - 2.0 * np.einsum('ij,ij->i', i, n)[:, None] * n
+
+def refract_batch(incident, normal, n1, n2, normalized=False):
+    # n1 y n2 pueden ser escalares o un índice por rayo.
+    # Devuelve (direcciones, tir); donde tir es True la dirección no es válida
+    i, n = (incident, normal) if normalized else (normalize_batch(incident), normalize_batch(normal))
+    eta = np.asarray(n1 / n2, dtype=np.float64)
+    cosi = np.einsum('ij,ij->i', i, n)
+    k = 1.0 - eta**2 * (1.0 - cosi**2)
+    tir = k < 0
+    k = np.maximum(k, 0.0)
+    return eta[..., None] * i - (eta * cosi + np.sqrt(k))[:, None] * n, tir
+
+def fresnel_batch(incident, normal, n1, n2, normalized=False):
+    i, n = (incident, normal) if normalized else (normalize_batch(incident), normalize_batch(normal))
+    cosi = np.clip(np.einsum('ij,ij->i', i, n), -1.0, 1.0)
+
+    inside = cosi > 0
+    n1, n2 = np.where(inside, n2, n1), np.where(inside, n1, n2)
+    cosi = np.abs(cosi)
+
+    eta = n1 / n2
+    sin_t_sq = eta**2 * (1 - cosi**2)
+    tir = sin_t_sq > 1
+    cos_t = np.sqrt(np.maximum(1 - sin_t_sq, 0.0))
+
+    r_s = ((n1 * cosi - n2 * cos_t) / (n1 * cosi + n2 * cos_t))**2
+    r_p = ((n2 * cosi - n1 * cos_t) / (n2 * cosi + n1 * cos_t))**2
+
+    return np.where(tir, 1.0, np.clip((r_s + r_p) * 0.5, 0.0, 1.0))
+
+# Números pseudoaleatorios sin estado: el valor depende solo de la clave (píxel, rama, muestra),
+# así el resultado no cambia con el tamaño de los tiles, el proceso o el orden de cálculo.
+
+GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+
+def mix_keys(keys, salt=0):
+    # splitmix64 sobre claves enteras; salt separa flujos distintos para la misma clave
+    with np.errstate(over='ignore'):
+        z = np.asarray(keys, dtype=np.uint64) + (np.asarray(salt, dtype=np.uint64) + np.uint64(1)) * GOLDEN_GAMMA
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+def uniform_from_keys(keys):
+    # Valores en [0, 1) con los 53 bits altos de la clave
+    return (np.asarray(keys, dtype=np.uint64) >> np.uint64(11)) * (1.0 / (1 << 53))
+
 def cast_ray_with_reflections(self, origin, direction, recursion=0):
     if recursion >= self.max_recursions:
         return [0, 0, 0]
@@ -54,16 +112,16 @@ def cast_ray_with_reflections(self, origin, direction, recursion=0):
     
     for obj in self.scene:
         intersect = obj.ray_intersect(origin, direction)
-        if intersect and intersect['distance'] < min_distance:
-            min_distance = intersect['distance']
+        if intersect and intersect.distance < min_distance:
+            min_distance = intersect.distance
             hit = intersect
             
     if not hit:
         return self.clear_color
         
-    material = hit['material']
-    point = hit['point']
-    normal = hit['normal']
+    material = hit.material
+    point = hit.point
+    normal = hit.normal
     
     if material.matType == "REFLECTIVE":
         reflect_dir = reflect(direction, normal)
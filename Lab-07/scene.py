@@ -0,0 +1,262 @@
+import numpy as np
+from figures import Sphere, Plane, Disk, Triangle, Cube, MaterialTable
+from intersections import sphere_distances, triangle_distances, box_distances, box_normals
+
+# Máximo de pares rayo x figura que se evalúan de una vez
+BLOCK_SIZE = 1 << 20
+
+class ShapeGroup:
+    """Figuras de un mismo tipo congeladas en arreglos contiguos"""
+
+    def __init__(self, ids):
+        self.ids = np.array(ids, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def hit_distances(self, origins, directions, members):
+        # Distancias (rayos, miembros), inf donde no hay choque
+        raise NotImplementedError
+
+    def hit_normals(self, origins, directions, distances, local):
+        # Normales solo de los choques ganadores, local es el índice dentro del grupo
+        raise NotImplementedError
+
+    def blocks(self, members, ray_count):
+        step = max(1, BLOCK_SIZE // max(1, ray_count))
+        for start in range(0, len(members), step):
+            yield members[start:start + step]
+
+    def closest(self, origins, directions, t_max, members):
+        distances = np.full(len(directions), np.inf)
+        local = np.full(len(directions), -1)
+        rows = np.arange(len(directions))
+
+        for block in self.blocks(members, len(directions)):
+            t = self.hit_distances(origins, directions, block)
+            nearest = np.argmin(t, axis=1)
+            t = t[rows, nearest]
+
+            closer = t < np.minimum(distances, t_max)
+            distances[closer] = t[closer]
+            local[closer] = block[nearest[closer]]
+
+        # Las normales se calculan al final, solo para los rayos que gana este grupo
+        return distances, local, None
+
+    def occluded(self, origins, directions, t_min, t_max, members):
+        blocked = np.zeros(len(directions), dtype=bool)
+
+        for block in self.blocks(members, len(directions)):
+            t = self.hit_distances(origins, directions, block)
+            blocked |= np.any((t > t_min) & (t < t_max[:, None]), axis=1)
+
+        return blocked
+
+class SphereGroup(ShapeGroup):
+    def __init__(self, ids, spheres):
+        super().__init__(ids)
+        self.centers = np.array([s.center for s in spheres], dtype=float).reshape(-1, 3)
+        self.radii2 = np.array([s.radius for s in spheres], dtype=float) ** 2
+
+    def hit_distances(self, origins, directions, members):
+        return sphere_distances(origins, directions, self.centers[members], self.radii2[members])
+
+    def hit_normals(self, origins, directions, distances, local):
+        points = origins + directions * distances[:, None]
+        normals = points - self.centers[local]
+        return normals / np.linalg.norm(normals, axis=1)[:, None]
+
+class PlaneGroup(ShapeGroup):
+    def __init__(self, ids, planes):
+        super().__init__(ids)
+        self.positions = np.array([p.position for p in planes], dtype=float).reshape(-1, 3)
+        self.normals = np.array([p.normal for p in planes], dtype=float).reshape(-1, 3)
+        self.offsets = np.einsum('ij,ij->i', self.positions, self.normals)
+
+    def plane_distances(self, origins, directions, members):
+        normals = self.normals[members]
+        denom = directions @ normals.T
+        hit = np.abs(denom) >= 1e-6
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = (self.offsets[members] - origins @ normals.T) / denom
+        hit &= t >= 0
+
+        return t, hit
+
+    def hit_distances(self, origins, directions, members):
+        t, hit = self.plane_distances(origins, directions, members)
+        return np.where(hit, t, np.inf)
+
+    def hit_normals(self, origins, directions, distances, local):
+        return self.normals[local]
+
+class DiskGroup(PlaneGroup):
+    def __init__(self, ids, disks):
+        super().__init__(ids, disks)
+        self.radii2 = np.array([d.radius for d in disks], dtype=float) ** 2
+
+    def hit_distances(self, origins, directions, members):
+        t, hit = self.plane_distances(origins, directions, members)
+
+        with np.errstate(invalid='ignore'):
+            points = origins[:, None, :] + directions[:, None, :] * t[:, :, None]
+            offsets = points - self.positions[members][None, :, :]
+            hit &= np.einsum('rkj,rkj->rk', offsets, offsets) <= self.radii2[members]
+
+        return np.where(hit, t, np.inf)
+
+class TriangleGroup(ShapeGroup):
+    def __init__(self, ids, triangles):
+        super().__init__(ids)
+        self.v0 = np.array([t.v0 for t in triangles], dtype=float).reshape(-1, 3)
+        self.edge1 = np.array([t.v1 for t in triangles], dtype=float).reshape(-1, 3) - self.v0
+        self.edge2 = np.array([t.v2 for t in triangles], dtype=float).reshape(-1, 3) - self.v0
+
+        normals = np.cross(self.edge1, self.edge2)
+        self.normals = normals / np.linalg.norm(normals, axis=1)[:, None]
+
+    def hit_distances(self, origins, directions, members):
+        return triangle_distances(origins, directions, self.v0[members], self.edge1[members], self.edge2[members])
+
+    def hit_normals(self, origins, directions, distances, local):
+        return self.normals[local]
+
+class BoxGroup(ShapeGroup):
+    def __init__(self, ids, cubes):
+        super().__init__(ids)
+        positions = np.array([c.position for c in cubes], dtype=float).reshape(-1, 3)
+        half_sizes = np.array([c.size / 2 for c in cubes], dtype=float)[:, None]
+        self.mins = positions - half_sizes
+        self.maxs = positions + half_sizes
+
+    def hit_distances(self, origins, directions, members):
+        return box_distances(origins, directions, self.mins[members], self.maxs[members])
+
+    def hit_normals(self, origins, directions, distances, local):
+        points = origins + directions * distances[:, None]
+        return box_normals(points, self.mins[local], self.maxs[local])
+
+class ObjectGroup:
+    """Objetos sin forma congelada (modelos, instancias, figuras propias): usan su propio ray_intersect_batch.
+    No tiene hit_distances/hit_normals; closest ya devuelve las normales."""
+
+    def __init__(self, ids, objects):
+        self.ids = np.array(ids, dtype=np.int64)
+        self.objects = list(objects)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def closest(self, origins, directions, t_max, members):
+        distances = np.array(t_max, dtype=float)
+        local = np.full(len(directions), -1)
+        normals = np.zeros(directions.shape)
+
+        for m in members:
+            d, n, closer = self.objects[m].ray_intersect_batch(origins, directions, distances)
+            distances[closer] = d[closer]
+            normals[closer] = n[closer]
+            local[closer] = m
+
+        return np.where(local >= 0, distances, np.inf), local, normals
+
+    def occluded(self, origins, directions, t_min, t_max, members):
+        blocked = np.zeros(len(directions), dtype=bool)
+        for m in members:
+            blocked |= self.objects[m].occludes_batch(origins, directions, t_min, t_max)
+        return blocked
+
+SHAPE_GROUPS = ((Sphere, SphereGroup), (Disk, DiskGroup), (Plane, PlaneGroup),
+                (Triangle, TriangleGroup), (Cube, BoxGroup))
+
+class Scene:
+    """Escena compilada: las figuras se agrupan por tipo en arreglos contiguos.
+    Es una copia congelada; si la lista de figuras cambia hay que volver a compilar."""
+
+    def __init__(self, objects):
+        self.objects = list(objects)
+
+        by_group = {}
+        for i, obj in enumerate(self.objects):
+            group_type = next((g for shape, g in SHAPE_GROUPS if type(obj) is shape), ObjectGroup)
+            by_group.setdefault(group_type, []).append(i)
+
+        self.groups = []
+        self.group_of = np.full(len(self.objects), -1)
+        self.local_of = np.full(len(self.objects), -1)
+
+        for group_type, ids in by_group.items():
+            self.group_of[ids] = len(self.groups)
+            self.local_of[ids] = np.arange(len(ids))
+            self.groups.append(group_type(ids, [self.objects[i] for i in ids]))
+
+        # Id de material por objeto; el sombreado agrupa los choques por este id
+        self.materials = MaterialTable()
+        self.material_ids = np.array([self.materials.register(obj.material) for obj in self.objects], dtype=np.int64)
+        self.materials.freeze()
+
+    def __len__(self):
+        return len(self.objects)
+
+    def __iter__(self):
+        return iter(self.objects)
+
+    def __getitem__(self, i):
+        return self.objects[i]
+
+    def members(self, ids):
+        # Agrupa ids globales de objetos en (número de grupo, índices locales)
+        if ids is None:
+            for g, group in enumerate(self.groups):
+                yield g, np.arange(len(group))
+            return
+
+        ids = np.asarray(ids)
+        groups = self.group_of[ids]
+        for g in np.unique(groups):
+            yield g, self.local_of[ids[groups == g]]
+
+    def closest_hit_batch(self, origins, directions, t_max=np.inf, ids=None):
+        origins = np.broadcast_to(origins, directions.shape)
+
+        distances = np.array(np.broadcast_to(t_max, len(directions)), dtype=float)
+        normals = np.zeros(directions.shape)
+        obj_ids = np.full(len(directions), -1)
+        winners = np.full(len(directions), -1)
+
+        for g, members in self.members(ids):
+            group = self.groups[g]
+            t, local, group_normals = group.closest(origins, directions, distances, members)
+            closer = local >= 0
+            distances[closer] = t[closer]
+            obj_ids[closer] = group.ids[local[closer]]
+
+            if group_normals is None:
+                winners[closer] = g
+            else:
+                winners[closer] = -1
+                normals[closer] = group_normals[closer]
+
+        for g, group in enumerate(self.groups):
+            rays = np.nonzero(winners == g)[0]
+            if len(rays):
+                local = self.local_of[obj_ids[rays]]
+                normals[rays] = group.hit_normals(origins[rays], directions[rays], distances[rays], local)
+
+        distances[obj_ids < 0] = np.inf
+        return distances, normals, obj_ids
+
+    def any_hit_batch(self, origins, directions, t_min, t_max, ids=None):
+        origins = np.broadcast_to(origins, directions.shape)
+        t_max = np.broadcast_to(np.asarray(t_max, dtype=float), len(directions))
+
+        blocked = np.zeros(len(directions), dtype=bool)
+        for g, members in self.members(ids):
+            rays = np.nonzero(~blocked)[0]
+            if len(rays) == 0:
+                break
+            blocked[rays] = self.groups[g].occluded(origins[rays], directions[rays], t_min, t_max[rays], members)
+
+        return blocked